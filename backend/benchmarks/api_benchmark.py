@@ -0,0 +1,364 @@
+"""
+Load/benchmark driver for the FiMoney API.
+
+Seeds users and products through the API, then runs each workload with a
+fixed concurrency and reports latency percentiles and throughput per
+endpoint. Results are written as JSON so runs can be compared.
+
+    # in-process (ASGI transport, throwaway SQLite database unless DATABASE_URL is set)
+    python -m benchmarks.api_benchmark --products 5000 --output results.json
+
+    # against a running server
+    python -m benchmarks.api_benchmark --url http://localhost:8000/api
+
+    # compare with an earlier run
+    python -m benchmarks.api_benchmark --compare results.json
+
+    # SQLite profile: stock journal vs WAL + serialized writer
+    SQLITE_PROFILE=default python -m benchmarks.api_benchmark --disable-response-cache \
+        --workloads create mixed_read_write --output sqlite-default.json
+    SQLITE_PROFILE=production python -m benchmarks.api_benchmark --disable-response-cache \
+        --workloads create mixed_read_write --compare sqlite-default.json
+
+    # product list serialization: pydantic models vs row tuples + orjson
+    python -m benchmarks.api_benchmark --disable-response-cache --pydantic-serialization \
+        --workloads list_full_page --output pydantic.json
+    python -m benchmarks.api_benchmark --disable-response-cache \
+        --workloads list_full_page --compare pydantic.json
+
+    # response compression: bytes on the wire and latency, identity vs gzip
+    # (use --url http://localhost/api to include nginx and its micro-cache)
+    python -m benchmarks.api_benchmark --no-compression \
+        --workloads list_full_page get_by_id --output identity.json
+    python -m benchmarks.api_benchmark \
+        --workloads list_full_page get_by_id --compare identity.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+import jwt
+
+from core.pagination import encode_cursor
+
+DEFAULT_WORKLOADS = ["login", "list_first_page", "list_full_page", "list_deep_page", "list_cursor_deep", "get_by_id", "create", "update_quantity", "mixed_read_write"]
+PAGE_SIZE = 20
+# Largest page GET /products allows; serialization dominates at this size
+FULL_PAGE_SIZE = 100
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark-password"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float, sizes: list[int]) -> dict:
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(statistics.fmean(values)) if values else 0.0,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else 0.0,
+        # As received, i.e. compressed when the server compressed it
+        "mean_bytes": round(statistics.fmean(sizes)) if sizes else 0,
+    }
+
+
+class BenchmarkContext:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.tokens: list[str] = []
+        self.usernames: list[str] = []
+        self.product_ids: list[int] = []
+        self.own_products: dict[str, list[int]] = {}
+        self.sequence = 0
+
+    def headers(self, token: str = None) -> dict:
+        return {"Authorization": f"Bearer {token or random.choice(self.tokens)}"}
+
+    def next_sku(self) -> str:
+        self.sequence += 1
+        return f"BENCH-{os.getpid()}-{int(time.time())}-{self.sequence}"
+
+
+def product_payload(sku: str, index: int) -> dict:
+    return {
+        "name": f"Benchmark product {index}",
+        "type": random.choice(["Electronics", "Grocery", "Apparel", "Toys", "Books"]),
+        "sku": sku,
+        "description": "Seeded by the benchmark suite",
+        "quantity": random.randint(0, 500),
+        "price": round(random.uniform(1, 1000), 2),
+    }
+
+
+async def seed(ctx: BenchmarkContext):
+    args = ctx.args
+    run_id = f"{os.getpid()}{int(time.time())}"
+    for i in range(args.users):
+        credentials = {"username": f"bench_{run_id}_{i}", "password": PASSWORD}
+        await ctx.client.post("/register", json=credentials)
+        res = await ctx.client.post("/login", json=credentials)
+        res.raise_for_status()
+        ctx.usernames.append(credentials["username"])
+        ctx.tokens.append(res.json()["access_token"])
+
+    per_user = max(1, args.products // max(1, args.users))
+    for token in ctx.tokens:
+        lines = "".join(
+            json.dumps(product_payload(ctx.next_sku(), i)) + "\n" for i in range(per_user)
+        )
+        res = await ctx.client.post(
+            "/products/import",
+            content=lines.encode(),
+            headers={**ctx.headers(token), "Content-Type": "application/x-ndjson"},
+        )
+        res.raise_for_status()
+
+    # Collect ids (and their owners) through the export endpoint
+    res = await ctx.client.get("/products/export", headers=ctx.headers())
+    res.raise_for_status()
+    by_owner: dict[int, list[int]] = {}
+    for line in res.text.splitlines():
+        product = json.loads(line)
+        ctx.product_ids.append(product["id"])
+        by_owner.setdefault(product["created_by"], []).append(product["id"])
+    ctx.product_ids.sort()
+
+    # Quantity updates must target products the token's user owns
+    for token in ctx.tokens:
+        user_id = jwt.decode(token, options={"verify_signature": False})["id"]
+        ctx.own_products[token] = by_owner.get(user_id, [])
+
+
+async def run_login(ctx: BenchmarkContext, i: int):
+    return await ctx.client.post("/login", json={"username": random.choice(ctx.usernames), "password": PASSWORD})
+
+
+async def run_list_first_page(ctx: BenchmarkContext, i: int):
+    return await ctx.client.get("/products/", params={"page": 1, "size": PAGE_SIZE}, headers=ctx.headers())
+
+
+async def run_list_full_page(ctx: BenchmarkContext, i: int):
+    last_page = max(1, len(ctx.product_ids) // FULL_PAGE_SIZE)
+    return await ctx.client.get(
+        "/products/", params={"page": random.randint(1, last_page), "size": FULL_PAGE_SIZE}, headers=ctx.headers()
+    )
+
+
+async def run_list_deep_page(ctx: BenchmarkContext, i: int):
+    last_page = max(1, len(ctx.product_ids) // PAGE_SIZE)
+    page = random.randint(max(1, last_page - 10), last_page)
+    return await ctx.client.get("/products/", params={"page": page, "size": PAGE_SIZE}, headers=ctx.headers())
+
+
+async def run_list_cursor_deep(ctx: BenchmarkContext, i: int):
+    ids = ctx.product_ids
+    after = ids[random.randint(max(0, len(ids) - PAGE_SIZE * 10), len(ids) - 1)]
+    cursor = encode_cursor("id", [after])
+    return await ctx.client.get("/products/", params={"after": cursor, "size": PAGE_SIZE}, headers=ctx.headers())
+
+
+async def run_get_by_id(ctx: BenchmarkContext, i: int):
+    return await ctx.client.get(f"/products/{random.choice(ctx.product_ids)}", headers=ctx.headers())
+
+
+async def run_create(ctx: BenchmarkContext, i: int):
+    return await ctx.client.post("/products/", json=product_payload(ctx.next_sku(), i), headers=ctx.headers())
+
+
+async def run_mixed_read_write(ctx: BenchmarkContext, i: int):
+    # Writers and readers interleaved: shows how the SQLite profile handles contention
+    if i % 2:
+        return await run_create(ctx, i)
+    return await run_get_by_id(ctx, i)
+
+
+async def run_update_quantity(ctx: BenchmarkContext, i: int):
+    token = random.choice([t for t in ctx.tokens if ctx.own_products.get(t)])
+    product_id = random.choice(ctx.own_products[token])
+    return await ctx.client.put(
+        f"/products/{product_id}/quantity", json={"quantity": random.randint(0, 500)}, headers=ctx.headers(token)
+    )
+
+
+WORKLOADS = {
+    "login": run_login,
+    "list_first_page": run_list_first_page,
+    "list_full_page": run_list_full_page,
+    "list_deep_page": run_list_deep_page,
+    "list_cursor_deep": run_list_cursor_deep,
+    "get_by_id": run_get_by_id,
+    "create": run_create,
+    "update_quantity": run_update_quantity,
+    "mixed_read_write": run_mixed_read_write,
+}
+
+
+async def run_workload(ctx: BenchmarkContext, name: str, total: int, concurrency: int) -> dict:
+    fn = WORKLOADS[name]
+    latencies: list[float] = []
+    sizes: list[int] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                res = await fn(ctx, i)
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+                sizes.append(res.num_bytes_downloaded)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, sizes)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(60.0)
+    headers = {"Accept-Encoding": "identity" if args.no_compression else "gzip"}
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        return httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=timeout, limits=limits, headers=headers)
+
+    # In-process: run against a throwaway SQLite database unless DATABASE_URL is set
+    workdir = tempfile.mkdtemp(prefix="fimoney-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("STARTUP_LOCK_FILE", os.path.join(workdir, "startup.lock"))
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    # Seeding and the login/create workloads would trip the per-IP limits
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    if args.disable_response_cache:
+        from core.response_cache import response_cache
+        response_cache.enabled = False
+    if args.pydantic_serialization:
+        from core import serialization
+        serialization.FAST_LIST_SERIALIZATION = False
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark/api", timeout=timeout, headers=headers
+    )
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    async with build_client(args) as client:
+        ctx = BenchmarkContext(client, args)
+        seed_started = time.perf_counter()
+        await seed(ctx)
+        seed_seconds = time.perf_counter() - seed_started
+
+        results = {}
+        for name in args.workloads:
+            if args.warmup:
+                await run_workload(ctx, name, args.warmup, args.concurrency)
+            results[name] = await run_workload(ctx, name, args.requests, args.concurrency)
+            print(f"{name:>18}: {results[name]}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "mode": "url" if args.url else "in-process",
+            "url": args.url,
+            "users": args.users,
+            "products": len(ctx.product_ids),
+            "requests_per_workload": args.requests,
+            "concurrency": args.concurrency,
+            "response_cache": not args.disable_response_cache,
+            "list_serialization": "pydantic" if args.pydantic_serialization else "orjson",
+            "accept_encoding": "identity" if args.no_compression else "gzip",
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('git_revision')}):")
+    for name, stats in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "mean_bytes"):
+            if before.get(key):
+                deltas.append(f"{key} {100 * (stats[key] - before[key]) / before[key]:+.1f}%")
+        print(f"{name:>18}: " + ", ".join(deltas))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FiMoney API hot paths")
+    parser.add_argument("--url", help="Base URL of a running API (e.g. http://localhost:8000/api); in-process when omitted")
+    parser.add_argument("--users", type=int, default=10, help="Users to seed")
+    parser.add_argument("--products", type=int, default=2000, help="Products to seed")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per workload")
+    parser.add_argument("--warmup", type=int, default=20, help="Unrecorded warm-up requests per workload")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=DEFAULT_WORKLOADS)
+    parser.add_argument("--disable-response-cache", action="store_true", help="In-process only: bypass the product response cache")
+    parser.add_argument("--pydantic-serialization", action="store_true", help="In-process only: render product lists through ProductListResponse instead of orjson")
+    parser.add_argument("--no-compression", action="store_true", help="Send Accept-Encoding: identity, so responses come back uncompressed")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    results = asyncio.run(run(args))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,67 @@
+import asyncio
 import jwt
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from fastapi import HTTPException, Depends
+from typing import Optional
+from fastapi import HTTPException, Depends, Query
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
-from database import get_db
+from database import AsyncSessionLocal, get_async_db
 from models.user import User
+from core.cache import TTLCache
+from core.metrics import counter, gauge
+from core.revocation import revocation_list
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTE = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTE", "30"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+# Trust the claims of a valid, unrevoked token instead of loading the user on
+# every request. Revocations still apply within REVOCATION_REFRESH_SECONDS.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login-oauth2")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="login-oauth2", auto_error=False)
+
+# Authenticated users resolved from a token, keyed by user id. Entries are
+# detached ORM objects, so handlers may read their columns but not lazy-load
+# relationships.
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+user_cache_hits = counter("auth_user_cache_hits_total", "Authenticated user lookups served from cache")
+user_cache_misses = counter("auth_user_cache_misses_total", "Authenticated user lookups that hit the database")
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.delete(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+async def get_user_by_id(user_id: int, db: AsyncSession) -> User:
+    user = user_cache.get(user_id)
+    if user is not None:
+        user_cache_hits.inc()
+        return user
+
+    user_cache_misses.inc()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is not None:
+        db.expunge(user)
+        user_cache.set(user_id, user)
+    return user
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,14 +69,56 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def authenticate_user(username: str, password: str, db: Session) -> User:
-    user = db.query(User).filter(User.username == username).first()
+# bcrypt is deliberately slow (~200ms) but releases the GIL, so a small thread
+# pool keeps hashing off the event loop while capping how many run at once.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_hash_queued = gauge("password_hash_queued", "Password hash/verify jobs waiting for a worker")
+password_hash_in_flight = gauge("password_hash_in_flight", "Password hash/verify jobs currently running")
+password_hash_jobs = counter("password_hash_jobs_total", "Password hash/verify jobs completed")
+password_hash_wait_seconds = counter("password_hash_wait_seconds_total", "Time jobs spent queued before a worker picked them up")
+
+async def _run_password_job(fn, *args):
+    submitted_at = time.perf_counter()
+    password_hash_queued.inc()
+
+    def job():
+        password_hash_queued.dec()
+        password_hash_wait_seconds.inc(time.perf_counter() - submitted_at)
+        password_hash_in_flight.inc()
+        try:
+            return fn(*args)
+        finally:
+            password_hash_in_flight.dec()
+            password_hash_jobs.inc()
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, job)
+
+def shutdown_password_pool() -> None:
+    _password_executor.shutdown(wait=True)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_job(get_password_hash, password)
+
+async def authenticate_user(username: str, password: str, db: AsyncSession) -> User:
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.hashedpassword):
+    if not await verify_password_async(password, user.hashedpassword):
         return None
     return user
 
+def token_claims(user: User) -> dict:
+    """
+    Claims embedded in an access token: enough to identify the user without a
+    query, plus the token version and a unique id so it can be revoked.
+    """
+    return {"id": user.id, "username": user.username, "ver": user.token_version or 0, "jti": uuid.uuid4().hex}
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -43,28 +130,68 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, db: Session):
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return payload
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    if payload.get("id") is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return payload
+
+async def _user_for_token(payload: dict, db: AsyncSession) -> User:
+    await revocation_list.refresh_if_stale()
+    if revocation_list.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+
+    if AUTH_STATELESS and "username" in payload and "ver" in payload:
+        # Transient, never added to a session: handlers only read its columns
+        return User(id=payload["id"], username=payload["username"], token_version=payload["ver"])
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = await get_user_by_id(payload["id"], db)
+    if user is not None and payload.get("ver", 0) > (user.token_version or 0):
+        # Issued after a version bump made on another worker: the cached copy
+        # is stale, not the token
+        invalidate_user(payload["id"])
+        user = await get_user_by_id(payload["id"], db)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("ver", 0) < (user.token_version or 0):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return user
+
+async def token_still_valid(payload: dict) -> bool:
+    """
+    Repeats the checks made when a long-lived connection was accepted
+    (denylist, user, token version), with its own short session.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = db.query(User).filter(User.id == user_id).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        async with AsyncSessionLocal() as db:
+            await _user_for_token(payload, db)
+    except HTTPException:
+        return False
+    return True
+
+async def verify_token(token: str, db: AsyncSession):
+    payload = decode_token(token)
+    await _user_for_token(payload, db)
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await _user_for_token(decode_token(token), db)
+
+async def get_current_user_and_token(
+    header_token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None, description="Bearer token, for clients that cannot set headers (EventSource)")
+) -> tuple[User, dict]:
+    """
+    Like get_current_user, but also accepts the token as a query parameter and
+    returns the decoded claims too (streams close when the token expires).
+    Uses its own short session so a long-lived stream holds no connection.
+    """
+    token = header_token or access_token
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    payload = decode_token(token)
+    async with AsyncSessionLocal() as db:
+        return await _user_for_token(payload, db), payload
@@ -0,0 +1,161 @@
+import gzip
+import os
+import zlib
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+
+from core.metrics import counter
+
+load_dotenv()
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Smaller bodies fit in a packet or two anyway; gzip would only add CPU and a header
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "5"))
+
+# text/event-stream is deliberately absent: compressed events sit in the
+# deflate window (and in proxies) instead of reaching the client
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+compressed_responses = counter("http_compressed_responses_total", "Responses sent gzip-encoded")
+compression_bytes_in = counter("http_compression_bytes_in_total", "Response bytes before gzip")
+compression_bytes_out = counter("http_compression_bytes_out_total", "Response bytes after gzip")
+
+
+def _qvalue(params: list[str]) -> float:
+    for param in params:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def gzip_accepted(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding value allows gzip. An explicit `gzip` entry
+    decides on its own q-value; otherwise `*` does; q=0 means "not acceptable".
+    """
+    weights = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        name = name.strip().lower()
+        if name in ("gzip", "x-gzip", "*"):
+            weights.setdefault("*" if name == "*" else "gzip", _qvalue(params))
+    q = weights.get("gzip", weights.get("*", 0.0))
+    return q > 0
+
+
+def accepts_gzip(scope) -> bool:
+    return gzip_accepted(Headers(scope=scope).get("accept-encoding", ""))
+
+
+class _GZipResponder:
+    """
+    Wraps `send` for one response. A complete body at least `minimum_size`
+    long is compressed in one go (with Content-Length); a streamed body is
+    compressed chunk by chunk, flushing each so streams stay incremental.
+    """
+
+    def __init__(self, send, accepts: bool, minimum_size: int, level: int):
+        self.send = send
+        self.accepts = accepts
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+            if content_type not in COMPRESSIBLE_TYPES or "content-encoding" in headers:
+                self.passthrough = True
+                await self.send(message)
+                return
+            # The body depends on Accept-Encoding, so shared caches (nginx) must key on it
+            MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+            if not self.accepts:
+                self.passthrough = True
+                await self.send(message)
+                return
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    await self.send(self.start)
+                    await self.send(message)
+                    return
+                compressed = gzip.compress(body, self.level)
+                self._encode_headers(len(compressed))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                self._count(len(body), len(compressed))
+                return
+            self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._encode_headers(None)
+            await self.send(self.start)
+            compressed_responses.inc()
+
+        data = self.compressor.compress(body) + self.compressor.flush(
+            zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH
+        )
+        compression_bytes_in.inc(len(body))
+        compression_bytes_out.inc(len(data))
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _encode_headers(self, length) -> None:
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = "gzip"
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        # Same entity, different bytes: a strong validator would be wrong now
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    def _count(self, size_in: int, size_out: int) -> None:
+        compressed_responses.inc()
+        compression_bytes_in.inc(size_in)
+        compression_bytes_out.inc(size_out)
+
+
+class GZipMiddleware:
+    """
+    Pure ASGI gzip for JSON, NDJSON, CSV and text responses of at least
+    `minimum_size` bytes. Event streams and already-encoded bodies pass through
+    untouched and unbuffered.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        level: int = COMPRESSION_LEVEL,
+        enabled: bool = COMPRESSION_ENABLED
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        responder = _GZipResponder(send, accepts_gzip(scope), self.minimum_size, self.level)
+        await self.app(scope, receive, responder)
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal
+from models.product import Product
+from models.stock_movement import StockMovement
+from core.auth import token_still_valid
+from core.ledger import as_utc
+from core.metrics import counter, gauge
+
+load_dotenv()
+
+# Events buffered per subscriber before the overflow policy applies
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+FEED_MAX_SUBSCRIBERS = int(os.getenv("FEED_MAX_SUBSCRIBERS", "1000"))
+# How often each worker tails the ledger for writes made by other workers
+# (writes in the same worker wake it immediately)
+FEED_POLL_INTERVAL_SECONDS = float(os.getenv("FEED_POLL_INTERVAL_SECONDS", "0.5"))
+FEED_KEEPALIVE_SECONDS = float(os.getenv("FEED_KEEPALIVE_SECONDS", "15"))
+# Events replayed on reconnect; further behind than this the client gets a
+# reset event and should reload its state instead
+FEED_RESUME_LIMIT = int(os.getenv("FEED_RESUME_LIMIT", "1000"))
+FEED_BATCH_SIZE = 500
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+EVENT_TYPES = {
+    "create": "product.created",
+    "import": "product.created",
+    "set": "quantity.changed",
+    "adjust": "quantity.changed",
+}
+
+logger = logging.getLogger("fimoney.feed")
+
+feed_subscribers = gauge("feed_subscribers", "Open stock feed connections in this worker")
+feed_events_sent = counter("feed_events_sent_total", "Stock feed events delivered to subscribers")
+feed_events_dropped = counter("feed_events_dropped_total", "Stock feed events dropped from full subscriber queues")
+
+
+@dataclass(frozen=True)
+class FeedFilter:
+    product_ids: frozenset = frozenset()
+    type: Optional[str] = None
+    owner: Optional[int] = None
+
+    def matches(self, event: dict) -> bool:
+        return (
+            (not self.product_ids or event["product_id"] in self.product_ids)
+            and (self.type is None or event["product_type"] == self.type)
+            and (self.owner is None or event["owner"] == self.owner)
+        )
+
+
+class Subscription:
+    """
+    One client's bounded queue. Replayed events (on resume) are kept apart and
+    delivered first, so live events that arrive meanwhile keep their order.
+    """
+
+    def __init__(self, filters: FeedFilter, overflow: str, maxsize: int = FEED_QUEUE_SIZE):
+        self.filters = filters
+        self.overflow = overflow
+        self.maxsize = maxsize
+        self.backlog: deque = deque()
+        self.queue: deque = deque()
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def offer(self, event: dict) -> None:
+        if self.closed or not self.filters.matches(event):
+            return
+        if len(self.queue) >= self.maxsize:
+            feed_events_dropped.inc()
+            if self.overflow == "disconnect":
+                # The client reconnects with Last-Event-ID and replays the gap
+                self.closed = True
+                self._ready.set()
+                return
+            self.dropped += 1
+            if self.overflow == "drop_newest":
+                return
+            self.queue.popleft()
+        self.queue.append(event)
+        self._ready.set()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """
+        Next event, or None when nothing arrived within `timeout`.
+        """
+        if not (self.backlog or self.queue or self.closed):
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.backlog:
+            return self.backlog.popleft()
+        if self.queue:
+            return self.queue.popleft()
+        return None
+
+
+def _event(row) -> dict:
+    return {
+        "seq": row.id,
+        "type": EVENT_TYPES.get(row.reason, "quantity.changed"),
+        "product_id": row.product_id,
+        "sku": row.sku,
+        "name": row.name,
+        "product_type": row.type,
+        "owner": row.created_by,
+        "delta": row.delta,
+        "quantity": row.quantity_after,
+        "reason": row.reason,
+        "user_id": row.user_id,
+        "ts": as_utc(row.ts).isoformat(),
+    }
+
+
+async def fetch_events(after: int, upto: Optional[int] = None, limit: int = FEED_BATCH_SIZE) -> list[dict]:
+    query = (
+        select(
+            StockMovement.id, StockMovement.product_id, StockMovement.delta, StockMovement.quantity_after,
+            StockMovement.reason, StockMovement.user_id, StockMovement.ts,
+            Product.sku, Product.name, Product.type, Product.created_by,
+        )
+        .join(Product, Product.id == StockMovement.product_id)
+        .where(StockMovement.id > after)
+        .order_by(StockMovement.id)
+        .limit(limit)
+    )
+    if upto is not None:
+        query = query.where(StockMovement.id <= upto)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query)
+        return [_event(row) for row in result]
+
+
+class StockFeed:
+    """
+    Fans stock changes out to subscribers. The stock_movements ledger is the
+    event log: its ids are the sequence numbers, so every worker publishes the
+    same events in the same order and clients resume from any worker. One
+    poller per worker tails the ledger while anyone is subscribed.
+
+    On PostgreSQL, ids are assigned before commit, so a slow transaction can
+    commit an id below one already published; such an event is only seen by
+    clients replaying from an earlier sequence.
+    """
+
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._last_seq = 0
+        self._wakeup = asyncio.Event()
+        self._poller: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+    def notify(self) -> None:
+        """
+        Called after a local commit that wrote movements, to publish without
+        waiting for the next poll.
+        """
+        self._wakeup.set()
+
+    async def subscribe(self, filters: FeedFilter, overflow: str, after: Optional[int] = None) -> Subscription:
+        if len(self._subscribers) >= FEED_MAX_SUBSCRIBERS:
+            raise HTTPException(status_code=503, detail="Too many feed subscribers", headers={"Retry-After": "5"})
+        async with self._start_lock:
+            if self._poller is None:
+                # New subscribers without a resume point start from "now"
+                async with AsyncSessionLocal() as db:
+                    self._last_seq = await db.scalar(select(func.coalesce(func.max(StockMovement.id), 0)))
+                self._poller = asyncio.create_task(self._poll())
+
+        subscription = Subscription(filters, overflow)
+        # Register before replaying: everything after `upto` arrives live
+        upto = self._last_seq
+        self._subscribers.add(subscription)
+        feed_subscribers.inc()
+        if after is not None and after < upto:
+            try:
+                events = await fetch_events(after, upto, limit=FEED_RESUME_LIMIT + 1)
+            except BaseException:
+                self.unsubscribe(subscription)
+                raise
+            if len(events) > FEED_RESUME_LIMIT:
+                subscription.backlog.append({"type": "reset", "seq": upto, "reason": "too far behind to replay"})
+            else:
+                subscription.backlog.extend(e for e in events if filters.matches(e))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            feed_subscribers.dec()
+
+    async def _poll(self) -> None:
+        try:
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), FEED_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    events = await fetch_events(self._last_seq)
+                except Exception:
+                    logger.exception("Reading the stock feed failed")
+                    await asyncio.sleep(FEED_POLL_INTERVAL_SECONDS)
+                    continue
+                for event in events:
+                    for subscription in list(self._subscribers):
+                        subscription.offer(event)
+                if events:
+                    self._last_seq = events[-1]["seq"]
+                if len(events) == FEED_BATCH_SIZE:
+                    self._wakeup.set()
+        finally:
+            self._poller = None
+
+
+async def stream_events(subscription: Subscription, payload: dict):
+    """
+    Server-sent events body for one subscription. Sends a comment as keepalive
+    when idle and ends when the token expires (the client reconnects with a
+    fresh token and Last-Event-ID), when it is revoked (re-checked every
+    FEED_KEEPALIVE_SECONDS) or when a "disconnect" subscriber overflows.
+    """
+    expires_at = payload.get("exp")
+    checked_at = time.monotonic()
+    try:
+        yield "retry: 3000\n\n"
+        while not subscription.closed:
+            if time.monotonic() - checked_at >= FEED_KEEPALIVE_SECONDS:
+                checked_at = time.monotonic()
+                if not await token_still_valid(payload):
+                    yield format_sse({"type": "revoked"})
+                    break
+
+            timeout = FEED_KEEPALIVE_SECONDS
+            if expires_at is not None:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    yield format_sse({"type": "expired"})
+                    break
+                timeout = min(timeout, remaining)
+
+            event = await subscription.next(timeout)
+            if subscription.dropped:
+                yield format_sse({"type": "dropped", "count": subscription.dropped})
+                subscription.dropped = 0
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            feed_events_sent.inc()
+            yield format_sse(event)
+    finally:
+        stock_feed.unsubscribe(subscription)
+
+
+def format_sse(event: dict) -> str:
+    lines = f"event: {event['type']}\n"
+    if "seq" in event:
+        lines += f"id: {event['seq']}\n"
+    return lines + f"data: {json.dumps(event)}\n\n"
+
+
+stock_feed = StockFeed()
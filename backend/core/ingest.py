@@ -0,0 +1,85 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional
+
+# (row number, parsed record or None, parse error or None)
+Record = tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decodes a UTF-8 byte stream incrementally and yields it line by line,
+    holding at most one partial line in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    row = 0
+    async for line in iter_lines(stream):
+        line = line.strip()
+        if not line:
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object"
+            continue
+        yield row, record, None
+
+
+async def iter_csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """
+    Parses a CSV stream with a header row. Physical lines are joined until the
+    quote count is even, so quoted fields may contain newlines. Empty cells
+    become None so optional fields validate as missing.
+    """
+    header = None
+    pending: list[str] = []
+    quotes = 0
+    row = 0
+    async for line in iter_lines(stream):
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        text = "\n".join(pending).rstrip("\r")
+        pending, quotes = [], 0
+        if not text.strip():
+            continue
+
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            if header is None:
+                raise ValueError(f"Invalid CSV header: {e}")
+            row += 1
+            yield row, None, f"Invalid CSV: {e}"
+            continue
+
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row, {name: (value if value != "" else None) for name, value in zip(header, values)}, None
+
+    if pending:
+        yield row + 1, None, "Unterminated quoted field at end of input"
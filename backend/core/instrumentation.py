@@ -0,0 +1,117 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.metrics import counter, histogram
+
+load_dotenv()
+
+# Requests running more statements than this are logged as likely N+1 patterns
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "20"))
+
+logger = logging.getLogger("fimoney.instrumentation")
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+http_request_duration = histogram(
+    "http_request_duration_seconds", "Request latency per route", labelnames=("method", "route", "status")
+)
+http_request_db_queries = histogram(
+    "http_request_db_queries", "SQL statements executed per request", labelnames=("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+)
+http_request_db_seconds = histogram(
+    "http_request_db_seconds", "Time spent in SQL per request", labelnames=("method", "route")
+)
+db_query_duration = histogram("db_query_duration_seconds", "Duration of individual SQL statements")
+db_queries_total = counter("db_queries_total", "SQL statements executed")
+query_budget_exceeded = counter("http_query_budget_exceeded_total", "Requests that ran more statements than QUERY_BUDGET")
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+# Set by the middleware for the duration of a request; the SQLAlchemy hooks add
+# to it. Sync sessions in the threadpool and async sessions (greenlets) both
+# inherit the request's context, so they see the same object.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    db_queries_total.inc()
+    db_query_duration.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def install_query_hooks(engine: Engine) -> None:
+    """
+    Times every statement on a sync engine (pass `async_engine.sync_engine`
+    for the async one).
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and SQL statistics per
+    route template (e.g. /products/{product_id}).
+    """
+
+    def __init__(self, app, query_budget: int = QUERY_BUDGET):
+        self.app = app
+        self.query_budget = query_budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+
+            http_request_duration.observe(elapsed, method=method, route=route_path, status=status)
+            http_request_db_queries.observe(stats.queries, method=method, route=route_path)
+            http_request_db_seconds.observe(stats.db_seconds, method=method, route=route_path)
+            if stats.queries > self.query_budget:
+                query_budget_exceeded.inc()
+                logger.warning(
+                    "%s %s ran %d SQL statements (budget %d) - possible N+1",
+                    method, route_path, stats.queries, self.query_budget
+                )
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+
+from database import AsyncSessionLocal, AsyncWriteSessionLocal
+from models.job import Job
+from core.metrics import counter, gauge
+
+load_dotenv()
+
+# Jobs running at once per worker process; the rest wait in the queue
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# Minimum interval between progress writes (each also checks for cancellation)
+JOB_PROGRESS_INTERVAL_SECONDS = float(os.getenv("JOB_PROGRESS_INTERVAL_SECONDS", "1"))
+# Workers refresh heartbeat_at of their jobs this often; jobs silent for three
+# intervals belonged to a worker that died and are marked failed
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+# Uploaded inputs and produced files; must be shared by the workers on the host
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join(tempfile.gettempdir(), "fimoney-jobs"))
+# Finished jobs, their result files and stray files (e.g. uploads left by a
+# worker that died) are deleted after this long; 0 keeps everything
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "3600"))
+JOB_SWEEP_BATCH_SIZE = 500
+# On shutdown, running jobs get this long to finish before they are interrupted
+# (and marked failed); keep it below gunicorn's GRACEFUL_TIMEOUT
+JOB_SHUTDOWN_GRACE_SECONDS = float(os.getenv("JOB_SHUTDOWN_GRACE_SECONDS", "20"))
+# Usernames allowed to start admin-only kinds (global maintenance) through the API
+JOB_ADMIN_USERS = frozenset(name.strip() for name in os.getenv("JOB_ADMIN_USERS", "").split(",") if name.strip())
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+logger = logging.getLogger("fimoney.jobs")
+
+jobs_queued = gauge("jobs_queued", "Background jobs waiting for a slot in this worker")
+jobs_running = gauge("jobs_running", "Background jobs running in this worker")
+jobs_succeeded = counter("jobs_succeeded_total", "Background jobs that completed")
+jobs_failed = counter("jobs_failed_total", "Background jobs that raised an error or were interrupted")
+jobs_cancelled = counter("jobs_cancelled_total", "Background jobs cancelled on request")
+jobs_swept = counter("jobs_swept_total", "Finished jobs deleted after JOB_RETENTION_SECONDS")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class JobHandler:
+    fn: Callable[["JobContext", dict], Awaitable[Any]]
+    # Validates params for POST /jobs; None means the kind is only submitted
+    # internally (e.g. imports, which need the uploaded body spooled first)
+    params_model: Optional[type[BaseModel]] = None
+    # Only users in JOB_ADMIN_USERS may submit it through the API
+    admin_only: bool = False
+    # Called with the params once the job is over, however it ended (also when
+    # it was cancelled before starting), to release inputs such as uploads
+    cleanup: Optional[Callable[[dict], None]] = None
+
+
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+
+def job_handler(
+    kind: str,
+    params_model: Optional[type[BaseModel]] = None,
+    admin_only: bool = False,
+    cleanup: Optional[Callable[[dict], None]] = None
+):
+    """
+    Registers an async handler `fn(ctx, params) -> result` for a job kind. The
+    result must be JSON-serializable.
+    """
+    def register(fn):
+        JOB_HANDLERS[kind] = JobHandler(fn, params_model, admin_only, cleanup)
+        return fn
+    return register
+
+
+def is_job_admin(user) -> bool:
+    return user.username in JOB_ADMIN_USERS
+
+
+def remove_file(path: Optional[str]) -> None:
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def job_file(job_id: str, suffix: str) -> str:
+    os.makedirs(JOB_FILES_DIR, exist_ok=True)
+    return os.path.join(JOB_FILES_DIR, f"{job_id}{suffix}")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """
+    Handed to a running handler for progress reporting and blocking work.
+    """
+
+    def __init__(self, runner: "JobRunner", job_id: str, user_id: int):
+        self.runner = runner
+        self.job_id = job_id
+        self.user_id = user_id
+        # Set by handlers that produce a file, served by GET /jobs/{id}/result
+        self.result_path: Optional[str] = None
+        self._reported_at = 0.0
+
+    async def progress(self, done: int, total: Optional[int] = None, force: bool = False) -> None:
+        """
+        Records progress (throttled) and raises JobCancelled if cancellation
+        was requested from any worker. Call it between transactions: it writes
+        through the write engine, which under the SQLite production profile
+        has a single connection.
+        """
+        now = time.monotonic()
+        if not force and now - self._reported_at < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        async with AsyncWriteSessionLocal() as db:
+            cancel_requested = await db.scalar(
+                update(Job)
+                .where(Job.id == self.job_id)
+                .values(progress_done=done, progress_total=total, heartbeat_at=_now())
+                .returning(Job.cancel_requested)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+    async def run_sync(self, fn, *args):
+        """
+        Runs blocking work (sync engine, CPU-bound loops) on the job thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.runner.executor, fn, *args)
+
+
+class JobRunner:
+    """
+    Runs jobs as asyncio tasks in the worker that accepted them, at most
+    `concurrency` at a time. State lives in the jobs table, so status,
+    cancellation and results work from any worker.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def submit(self, kind: str, params: dict, user_id: int, job_id: Optional[str] = None) -> Job:
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        now = _now()
+        job = Job(
+            id=job_id or new_job_id(),
+            kind=kind,
+            status=QUEUED,
+            params=json.dumps(params),
+            progress_done=0,
+            cancel_requested=False,
+            created_by=user_id,
+            created_at=now,
+            heartbeat_at=now,
+        )
+        async with AsyncWriteSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+
+        jobs_queued.inc()
+        task = asyncio.create_task(self._run(job.id, kind, params, user_id))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def cancel(self, job_id: str) -> None:
+        async with AsyncWriteSessionLocal() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES)).values(cancel_requested=True)
+            )
+            # A queued job has done nothing yet and can be closed right away;
+            # whichever worker holds it will skip it
+            await db.execute(
+                update(Job).where(Job.id == job_id, Job.status == QUEUED).values(status=CANCELLED, finished_at=_now())
+            )
+            await db.commit()
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+
+    async def _run(self, job_id: str, kind: str, params: dict, user_id: int) -> None:
+        ctx = JobContext(self, job_id, user_id)
+        waiting = True
+        try:
+            async with self._semaphore:
+                jobs_queued.dec()
+                waiting = False
+                if not await self._mark_running(job_id):
+                    return
+                jobs_running.inc()
+                try:
+                    result = await JOB_HANDLERS[kind].fn(ctx, params)
+                finally:
+                    jobs_running.dec()
+            await self._finish(job_id, SUCCEEDED, result=json.dumps(result), result_path=ctx.result_path)
+            jobs_succeeded.inc()
+        except (asyncio.CancelledError, JobCancelled):
+            if waiting:
+                jobs_queued.dec()
+            if self._stopping:
+                await self._finish(job_id, FAILED, error="Interrupted by worker shutdown")
+                jobs_failed.inc()
+            else:
+                await self._finish(job_id, CANCELLED)
+                jobs_cancelled.inc()
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            await self._finish(job_id, FAILED, error=str(e))
+            jobs_failed.inc()
+        finally:
+            cleanup = JOB_HANDLERS[kind].cleanup
+            if cleanup is not None:
+                try:
+                    await asyncio.to_thread(cleanup, params)
+                except Exception:
+                    logger.exception("Cleanup of job %s (%s) failed", job_id, kind)
+
+    async def _mark_running(self, job_id: str) -> bool:
+        async with AsyncWriteSessionLocal() as db:
+            started = await db.scalar(
+                update(Job)
+                .where(Job.id == job_id, Job.status == QUEUED, Job.cancel_requested.is_(False))
+                .values(status=RUNNING, started_at=_now(), heartbeat_at=_now())
+                .returning(Job.id)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        return started is not None
+
+    async def _finish(self, job_id: str, status: str, **values) -> None:
+        # Never overwrite a job another worker (or a cancel) already closed
+        async with AsyncWriteSessionLocal() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES))
+                .values(status=status, finished_at=_now(), **values)
+            )
+            await db.commit()
+
+    async def _heartbeat(self) -> None:
+        swept_at = time.monotonic()
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await self._beat()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+            if JOB_RETENTION_SECONDS > 0 and time.monotonic() - swept_at >= JOB_SWEEP_INTERVAL_SECONDS:
+                swept_at = time.monotonic()
+                try:
+                    await self.sweep()
+                except Exception:
+                    logger.exception("Job retention sweep failed")
+
+    async def _beat(self) -> None:
+        stale = _now() - timedelta(seconds=3 * JOB_HEARTBEAT_SECONDS)
+        async with AsyncSessionLocal() as db:
+            orphaned = (await db.execute(
+                select(Job.id).where(Job.status.in_(ACTIVE_STATUSES), Job.heartbeat_at < stale)
+            )).scalars().all()
+        # Idle workers only read, so they never queue behind the SQLite writer
+        if not (self._tasks or orphaned):
+            return
+
+        async with AsyncWriteSessionLocal() as db:
+            if self._tasks:
+                await db.execute(update(Job).where(Job.id.in_(list(self._tasks))).values(heartbeat_at=_now()))
+            if orphaned:
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(orphaned), Job.status.in_(ACTIVE_STATUSES), Job.heartbeat_at < stale)
+                    .values(status=FAILED, error="Worker stopped before the job finished", finished_at=_now())
+                )
+                jobs_failed.inc(result.rowcount)
+            await db.commit()
+
+    async def sweep(self, retention_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        """
+        Deletes jobs finished more than `retention_seconds` ago with their
+        result files, then any file in JOB_FILES_DIR that old which no active
+        job still uses. Safe to run from every worker at once.
+        """
+        cutoff = _now() - timedelta(seconds=retention_seconds)
+        swept = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                expired = (await db.execute(
+                    select(Job.id, Job.result_path)
+                    .where(Job.status.not_in(ACTIVE_STATUSES), Job.finished_at < cutoff)
+                    .limit(JOB_SWEEP_BATCH_SIZE)
+                )).all()
+            if not expired:
+                break
+            for _, path in expired:
+                await asyncio.to_thread(remove_file, path)
+            # One short write transaction per batch keeps the SQLite writer free
+            async with AsyncWriteSessionLocal() as db:
+                result = await db.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in expired])))
+                await db.commit()
+            jobs_swept.inc(result.rowcount)
+            swept += len(expired)
+            if len(expired) < JOB_SWEEP_BATCH_SIZE:
+                break
+
+        async with AsyncSessionLocal() as db:
+            active = set((await db.execute(select(Job.id).where(Job.status.in_(ACTIVE_STATUSES)))).scalars())
+        await asyncio.to_thread(_remove_stale_files, cutoff.timestamp(), active)
+        return swept
+
+    def start(self) -> None:
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def shutdown(self, grace_seconds: float = JOB_SHUTDOWN_GRACE_SECONDS) -> None:
+        """
+        Lets this worker's jobs finish for up to `grace_seconds`, then
+        interrupts the rest (recorded as failed) and stops the pool.
+        """
+        tasks = list(self._tasks.values())
+        if tasks and grace_seconds > 0:
+            logger.info("Waiting up to %ss for %d job(s) before shutting down", grace_seconds, len(tasks))
+            await asyncio.wait(tasks, timeout=grace_seconds)
+        self._stopping = True
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _remove_stale_files(older_than: float, active_job_ids: set) -> None:
+    if not os.path.isdir(JOB_FILES_DIR):
+        return
+    for entry in os.scandir(JOB_FILES_DIR):
+        # Files are named <job id><suffix>
+        job_id = entry.name.partition(".")[0]
+        if entry.is_file() and job_id not in active_job_ids and entry.stat().st_mtime < older_than:
+            remove_file(entry.path)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+job_runner = JobRunner()
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import engine
+from models.stock_movement import StockMovement, StockSnapshot
+
+load_dotenv()
+
+logger = logging.getLogger("fimoney.ledger")
+
+# How often the app itself snapshots stock levels; 0 leaves it to a scheduled
+# `python manage.py snapshot-stock`
+STOCK_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("STOCK_SNAPSHOT_INTERVAL_SECONDS", "0"))
+
+
+def as_utc(ts: datetime) -> datetime:
+    """
+    Normalises a timestamp for comparison with ledger rows; naive values are
+    taken to be UTC already.
+    """
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+class StockMovements:
+    """
+    Collects the quantity changes of one transaction so they are appended to
+    the ledger with a single executemany INSERT before the commit.
+    """
+
+    def __init__(self, user_id: Optional[int], reason: str):
+        self.user_id = user_id
+        self.reason = reason
+        self.ts = datetime.now(timezone.utc)
+        self._rows = []
+
+    def record(
+        self, product_id: int, old_quantity: Optional[int], new_quantity: Optional[int], always: bool = False
+    ) -> None:
+        """
+        Skips changes that leave the quantity as it was unless `always` is set
+        (creations are recorded even at zero so the feed announces them).
+        """
+        delta = (new_quantity or 0) - (old_quantity or 0)
+        if delta or always:
+            self._rows.append({
+                "product_id": product_id, "delta": delta, "quantity_after": new_quantity or 0,
+                "user_id": self.user_id, "reason": self.reason, "ts": self.ts,
+            })
+
+    async def apply(self, db: AsyncSession) -> None:
+        if self._rows:
+            await db.execute(insert(StockMovement), self._rows)
+        self._rows = []
+
+
+async def quantity_at(db: AsyncSession, product_id: int, at: datetime) -> int:
+    """
+    Quantity of a product at `at`: the latest snapshot taken at or before
+    then, plus the movements recorded after it.
+    """
+    at = as_utc(at)
+    snapshot = (await db.execute(
+        select(StockSnapshot.quantity, StockSnapshot.movement_id)
+        .where(StockSnapshot.product_id == product_id, StockSnapshot.ts <= at)
+        .order_by(StockSnapshot.ts.desc(), StockSnapshot.id.desc())
+        .limit(1)
+    )).first()
+    base, movement_id = (snapshot.quantity, snapshot.movement_id) if snapshot else (0, 0)
+
+    tail = await db.scalar(
+        select(func.coalesce(func.sum(StockMovement.delta), 0))
+        .where(
+            StockMovement.product_id == product_id,
+            StockMovement.id > movement_id,
+            StockMovement.ts <= at,
+        )
+    )
+    return base + tail
+
+
+def take_snapshots(connection) -> int:
+    """
+    Writes a snapshot for every product with movements since its latest
+    snapshot, carrying that snapshot's quantity forward. Returns the number
+    of snapshots written.
+    """
+    latest = (
+        select(
+            StockSnapshot.product_id,
+            func.max(StockSnapshot.movement_id).label("movement_id"),
+        )
+        .group_by(StockSnapshot.product_id)
+        .subquery()
+    )
+    previous = (
+        select(StockSnapshot.product_id, StockSnapshot.movement_id, func.max(StockSnapshot.quantity).label("quantity"))
+        .join(latest, (StockSnapshot.product_id == latest.c.product_id) & (StockSnapshot.movement_id == latest.c.movement_id))
+        .group_by(StockSnapshot.product_id, StockSnapshot.movement_id)
+        .subquery()
+    )
+    pending = (
+        select(
+            StockMovement.product_id,
+            func.max(StockMovement.id),
+            func.coalesce(func.max(previous.c.quantity), 0) + func.sum(StockMovement.delta),
+            func.max(StockMovement.ts),
+        )
+        .outerjoin(previous, previous.c.product_id == StockMovement.product_id)
+        .where(StockMovement.id > func.coalesce(previous.c.movement_id, 0))
+        .group_by(StockMovement.product_id)
+    )
+
+    if connection.dialect.name == "postgresql":
+        # Movements committing mid-snapshot could otherwise get ids below the
+        # new watermark and be skipped by point-in-time queries
+        connection.exec_driver_sql("LOCK TABLE stock_movements IN SHARE MODE")
+    result = connection.execute(
+        insert(StockSnapshot).from_select(["product_id", "movement_id", "quantity", "ts"], pending)
+    )
+    return result.rowcount
+
+
+def snapshot_stock() -> int:
+    with engine.begin() as connection:
+        return take_snapshots(connection)
+
+
+async def run_snapshot_loop(interval: float) -> None:
+    """
+    Background task started by the app lifespan when
+    STOCK_SNAPSHOT_INTERVAL_SECONDS is set.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(snapshot_stock)
+        except Exception:
+            logger.exception("Stock snapshot failed")
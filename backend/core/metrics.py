@@ -0,0 +1,143 @@
+import bisect
+import threading
+from typing import Union
+
+Number = Union[int, float]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """
+    Monotonic in-process counter. Values are per worker process.
+    """
+    type = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: Number = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> Number:
+        return self._value
+
+    def samples(self):
+        yield self.name, {}, self._value
+
+
+class Gauge(Counter):
+    """
+    In-process value that can go up and down (queue depth, in-flight work).
+    """
+    type = "gauge"
+
+    def dec(self, amount: Number = 1) -> None:
+        self.inc(-amount)
+
+    def set(self, value: Number) -> None:
+        with self._lock:
+            self._value = value
+
+
+class Histogram:
+    """
+    Bucketed distribution keyed by label values, e.g. latency per route.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, description: str = "", labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: Number, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+REGISTRY: dict[str, Union[Counter, Histogram]] = {}
+
+
+def _register(cls, name: str, description: str, **kwargs):
+    if name not in REGISTRY:
+        REGISTRY[name] = cls(name, description, **kwargs)
+    return REGISTRY[name]
+
+
+def counter(name: str, description: str = "") -> Counter:
+    """
+    Returns the counter registered under `name`, creating it on first use.
+    """
+    return _register(Counter, name, description)
+
+
+def gauge(name: str, description: str = "") -> Gauge:
+    """
+    Returns the gauge registered under `name`, creating it on first use.
+    """
+    return _register(Gauge, name, description)
+
+
+def histogram(name: str, description: str = "", labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """
+    Returns the histogram registered under `name`, creating it on first use.
+    """
+    return _register(Histogram, name, description, labelnames=labelnames, buckets=buckets)
+
+
+def snapshot() -> dict[str, Number]:
+    return {name: metric.value for name, metric in REGISTRY.items() if not isinstance(metric, Histogram)}
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus() -> str:
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        if metric.description:
+            lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        for sample_name, labels, value in metric.samples():
+            lines.append(f"{sample_name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+import base64
+import json
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+def encode_cursor(sort: str, values: list[Any]) -> str:
+    """
+    Builds an opaque keyset cursor from the sort key name and the
+    values of the last row on the page (sort column value(s) + id).
+    """
+    raw = json.dumps({"s": sort, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _coerce(value: Any, column) -> Any:
+    # JSON only has numbers and strings; check them against the column so a
+    # tampered cursor is a 400, not a database type error
+    python_type = column.type.python_type
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if python_type is float and isinstance(value, (int, float)):
+        return float(value)
+    if python_type is int and isinstance(value, int):
+        return value
+    if python_type is str and isinstance(value, str):
+        return value
+    raise ValueError(value)
+
+
+def decode_cursor(token: str, sort: str, columns: Optional[Sequence] = None) -> list[Any]:
+    """
+    Decodes a cursor produced by encode_cursor. The cursor must have been
+    issued for the same sort key, otherwise the keyset would be meaningless.
+    With `columns`, the values are also checked against the sort columns'
+    types (int, float or str columns only).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data["v"]
+        cursor_sort = data["s"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+    if cursor_sort != sort or not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    if columns is not None:
+        if len(values) != len(columns):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        try:
+            values = [_coerce(value, column) for value, column in zip(values, columns)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return values
+
+
+def next_cursor_for(rows: list, size: int, sort: str, key) -> Optional[str]:
+    """
+    Given rows fetched with limit(size + 1), returns the cursor for the next
+    page or None when this is the last page. `key` maps a row to its keyset values.
+    """
+    if len(rows) <= size:
+        return None
+    return encode_cursor(sort, key(rows[size - 1]))
@@ -0,0 +1,228 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from core.auth import decode_token
+from core.metrics import counter, gauge
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client address from X-Real-IP / X-Forwarded-For. Only safe when the
+# app is reachable through the proxy alone (as in docker-compose.yml).
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() in ("1", "true", "yes")
+
+# "<requests>/<second|minute|hour>": bucket size and the rate it refills at
+RATE_LIMITS = {
+    "login": os.getenv("RATE_LIMIT_LOGIN", "10/minute"),
+    "register": os.getenv("RATE_LIMIT_REGISTER", "5/minute"),
+    "write": os.getenv("RATE_LIMIT_WRITE", "120/minute"),
+    "bulk": os.getenv("RATE_LIMIT_BULK", "10/minute"),
+}
+
+# Requests admitted at once per worker before new ones get 503. Cheap reads
+# have their own, higher limit so writes and bulk work are shed first.
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT", "64"))
+LOAD_SHED_MAX_IN_FLIGHT_READS = int(os.getenv("LOAD_SHED_MAX_IN_FLIGHT_READS", "256"))
+LOAD_SHED_RETRY_AFTER_SECONDS = int(os.getenv("LOAD_SHED_RETRY_AFTER_SECONDS", "1"))
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+rate_limited_requests = counter("http_rate_limited_total", "Requests rejected with 429 by a rate limit")
+shed_requests = counter("http_load_shed_total", "Requests rejected with 503 by load shedding")
+in_flight_requests = gauge("http_requests_in_flight", "Requests currently being handled by this worker")
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    capacity: float
+    refill_per_second: float
+
+
+def parse_rate(name: str, spec: str) -> RateLimitPolicy:
+    try:
+        count, period = spec.split("/")
+        capacity = float(count)
+        seconds = PERIODS[period.strip().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{spec}' for '{name}'; expected e.g. '10/minute'")
+    return RateLimitPolicy(name, capacity, capacity / seconds)
+
+
+POLICIES = {name: parse_rate(name, spec) for name, spec in RATE_LIMITS.items()}
+
+
+class RateLimitStore(Protocol):
+    """
+    Token bucket storage used by RateLimiter. The in-memory store is per worker;
+    a shared store only needs the same method.
+    """
+
+    def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens from the bucket under `key`. Returns 0 when allowed,
+        otherwise the seconds until enough tokens are available.
+        """
+        ...
+
+
+class InMemoryRateLimitStore:
+    """
+    Token buckets in process memory, least recently used evicted past
+    `maxsize` keys (an evicted bucket simply starts full again).
+    """
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RateLimiter:
+    def __init__(self, store: Optional[RateLimitStore] = None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store or InMemoryRateLimitStore()
+        self.enabled = enabled
+
+    def check(self, policy: RateLimitPolicy, identity: str) -> None:
+        if not self.enabled:
+            return
+        wait = self.store.take(f"{policy.name}:{identity}", policy.capacity, policy.refill_per_second)
+        if wait:
+            rate_limited_requests.inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+
+rate_limiter = RateLimiter()
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _token_user_id(request: Request) -> Optional[int]:
+    # Signature check only (no DB): a forged token cannot drain someone else's bucket
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_token(token)["id"]
+    except HTTPException:
+        return None
+
+
+def rate_limit(policy_name: str, per: str = "user"):
+    """
+    Route dependency enforcing a policy per authenticated user (falling back to
+    the client IP) or, with per="ip", per client IP. Use it in the route's
+    `dependencies` so it runs before authentication and password hashing.
+    """
+    policy = POLICIES[policy_name]
+
+    async def dependency(request: Request):
+        user_id = _token_user_id(request) if per == "user" else None
+        identity = f"user:{user_id}" if user_id is not None else f"ip:{client_ip(request)}"
+        rate_limiter.check(policy, identity)
+
+    return dependency
+
+
+def _is_cheap_read(scope) -> bool:
+    # Streaming exports are long-running even though they are GETs
+    return scope["method"] in ("GET", "HEAD") and not scope["path"].endswith("/export")
+
+
+def _overloaded_response(detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": detail},
+        headers={"Retry-After": str(LOAD_SHED_RETRY_AFTER_SECONDS)}
+    )
+
+
+class LoadSheddingMiddleware:
+    """
+    Pure ASGI admission control: rejects new requests with 503 once this worker
+    is handling too many. Cheap reads are admitted up to a higher limit, so
+    lookups such as GET /products/{id} keep their latency while writes and
+    bulk work back off. Paths ending in one of `exempt_suffixes` (long-lived
+    streams that are mostly idle) are neither limited nor counted.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_in_flight: int = LOAD_SHED_MAX_IN_FLIGHT,
+        max_in_flight_reads: int = LOAD_SHED_MAX_IN_FLIGHT_READS,
+        exempt_suffixes: tuple[str, ...] = ()
+    ):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_reads = max_in_flight_reads
+        self.exempt_suffixes = exempt_suffixes
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].endswith(self.exempt_suffixes):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_in_flight_reads if _is_cheap_read(scope) else self.max_in_flight
+        if self.in_flight >= limit:
+            shed_requests.inc()
+            await _overloaded_response("Server is overloaded, retry shortly")(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        in_flight_requests.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            in_flight_requests.dec()
+
+
+async def pool_timeout_handler(request: Request, exc: Exception) -> JSONResponse:
+    """
+    Handler for sqlalchemy.exc.TimeoutError: a request that found the pool
+    exhausted and got no connection within DB_POOL_SHED_SECONDS (or any wait
+    past DB_POOL_TIMEOUT) means the database is the bottleneck, so answer 503.
+    """
+    shed_requests.inc()
+    return _overloaded_response("Database is busy, retry shortly")
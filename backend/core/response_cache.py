@@ -0,0 +1,185 @@
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Protocol
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+from core.cache import TTLCache
+from core.metrics import counter
+
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "2048"))
+# Shared by every worker process on the host (gunicorn or uvicorn --workers);
+# empty disables cross-process coordination
+RESPONSE_CACHE_STAMP_FILE = os.getenv(
+    "RESPONSE_CACHE_STAMP_FILE", os.path.join(tempfile.gettempdir(), "fimoney-response-cache.stamp")
+)
+
+LIST_GENERATION_KEY = "products:generation"
+
+response_cache_hits = counter("response_cache_hits_total", "Product reads served from the response cache")
+response_cache_misses = counter("response_cache_misses_total", "Product reads rendered from the database")
+
+
+class CacheBackend(Protocol):
+    """
+    Storage used by ResponseCache. TTLCache is the default; anything with the
+    same methods (a shared store, or a stub) can be swapped in.
+    """
+
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    stamp: int = 0
+
+
+class FileStamp:
+    """
+    Cross-process write stamp: the mtime (in ns) of a file every worker can
+    see. Reading it is a single stat() call, so cached reads still avoid the DB.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path):
+            open(path, "a").close()
+
+    def current(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self) -> None:
+        now = time.time_ns()
+        try:
+            os.utime(self.path, ns=(now, now))
+        except FileNotFoundError:
+            open(self.path, "a").close()
+
+
+class ResponseCache:
+    """
+    Caches serialized product responses. Single products and list pages are
+    keyed under generation stamps that writes replace: a product write drops
+    that product and all cached pages at once. Keys are taken before the
+    database read, so a render that raced a write is stored under a retired
+    key and never served.
+
+    With several worker processes each keeps its own cache, so a `shared_stamp`
+    is also bumped on every write; entries rendered before the last bump by any
+    worker are treated as misses. Callers pass the stamp from `current_stamp()`,
+    likewise taken before the read, to `store`.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        shared_stamp: Optional[FileStamp] = None
+    ):
+        self.backend = backend or TTLCache(maxsize=RESPONSE_CACHE_MAX_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+        self.enabled = enabled
+        self.shared_stamp = shared_stamp
+
+    def product_key(self, product_id: int) -> str:
+        generation = self.backend.get(self._product_generation_key(product_id))
+        if generation is None:
+            generation = self._new_generation(self._product_generation_key(product_id))
+        return f"product:{product_id}:{generation}"
+
+    def list_key(self, request: Request) -> str:
+        generation = self.backend.get(LIST_GENERATION_KEY)
+        if generation is None:
+            # Stamp missing (first use or evicted): start a fresh generation
+            # rather than risk serving pages cached under an older one
+            generation = self._new_generation(LIST_GENERATION_KEY)
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"products:{generation}:{query}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.backend.get(key) if self.enabled else None
+        if entry is not None and self.shared_stamp is not None and entry.stamp != self.shared_stamp.current():
+            entry = None
+        if entry is None:
+            response_cache_misses.inc()
+        else:
+            response_cache_hits.inc()
+        return entry
+
+    def current_stamp(self) -> int:
+        return self.shared_stamp.current() if self.shared_stamp is not None else 0
+
+    def store(self, key: str, body: bytes, stamp: int) -> CachedResponse:
+        entry = CachedResponse(
+            body=body,
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            stamp=stamp,
+        )
+        if self.enabled:
+            self.backend.set(key, entry)
+        return entry
+
+    def invalidate_product(self, product_id: int) -> None:
+        self._new_generation(self._product_generation_key(product_id))
+        self.invalidate_lists()
+
+    def invalidate_lists(self) -> None:
+        self._new_generation(LIST_GENERATION_KEY)
+        if self.shared_stamp is not None:
+            self.shared_stamp.bump()
+
+    def _product_generation_key(self, product_id: int) -> str:
+        return f"product:{product_id}:generation"
+
+    def _new_generation(self, generation_key: str) -> int:
+        generation = time.time_ns()
+        self.backend.set(generation_key, generation, ttl=float("inf"))
+        return generation
+
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    # ETag only: the render time is not when the data changed, and a write in
+    # the same second as a render would make If-Modified-Since answer 304
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or entry.etag in tags
+
+
+def cached_json_response(request: Request, entry: CachedResponse) -> Response:
+    """
+    Builds the response for a cached entry, answering 304 Not Modified when the
+    client's validators still match.
+    """
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    shared_stamp=FileStamp(RESPONSE_CACHE_STAMP_FILE) if RESPONSE_CACHE_STAMP_FILE else None
+)
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models.revoked_token import RevokedToken
+from core.metrics import counter
+from core.stats import UPSERT_DIALECTS
+
+load_dotenv()
+
+# Upper bound on how long a revocation made by another worker takes to apply here
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+
+revocation_refreshes = counter("auth_revocation_refreshes_total", "Reloads of the token denylist from the database")
+revoked_token_rejections = counter("auth_revoked_token_rejections_total", "Requests rejected with a revoked token")
+
+
+class RevocationList:
+    """
+    In-memory copy of the unexpired revocations: denied token ids (jti) and,
+    per user, the lowest token version still accepted. Reloaded from the
+    revoked_tokens table every REVOCATION_REFRESH_SECONDS; revocations made in
+    this process apply immediately.
+    """
+
+    def __init__(self, refresh_seconds: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._jtis: set[str] = set()
+        self._min_versions: dict[int, int] = {}
+        self._refreshed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        revoked = (jti is not None and jti in self._jtis) or (
+            payload.get("ver", 0) < self._min_versions.get(payload.get("id"), 0)
+        )
+        if revoked:
+            revoked_token_rejections.inc()
+        return revoked
+
+    def deny_jti(self, jti: str) -> None:
+        self._jtis.add(jti)
+
+    def deny_below_version(self, user_id: int, version: int) -> None:
+        self._min_versions[user_id] = max(version, self._min_versions.get(user_id, 0))
+
+    async def refresh_if_stale(self) -> None:
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+                return
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(RevokedToken.jti, RevokedToken.user_id, RevokedToken.token_version)
+                .where(RevokedToken.expires_at > datetime.now(timezone.utc))
+            )
+            rows = result.all()
+
+        jtis, min_versions = set(), {}
+        for jti, user_id, version in rows:
+            if jti is not None:
+                jtis.add(jti)
+            if version is not None:
+                min_versions[user_id] = max(version, min_versions.get(user_id, 0))
+        self._jtis, self._min_versions = jtis, min_versions
+        self._refreshed_at = time.monotonic()
+        revocation_refreshes.inc()
+
+
+revocation_list = RevocationList()
+
+
+async def _trim_expired(db: AsyncSession, now: datetime) -> None:
+    # Expired rows no longer matter; trimming on every revocation keeps the
+    # table (and every worker's copy of it) bounded without a cleanup job
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+
+
+async def revoke_token(db: AsyncSession, jti: str, user_id: int, expires_at: datetime) -> None:
+    """
+    Denies one token until it would have expired anyway, inside the caller's
+    transaction. The caller commits and then calls `revocation_list.deny_jti`.
+    Revoking an already revoked token (a repeated or concurrent logout) is a
+    no-op.
+    """
+    now = datetime.now(timezone.utc)
+    stmt = UPSERT_DIALECTS[db.bind.dialect.name](RevokedToken).values(
+        jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=now
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=[RevokedToken.jti]))
+    await _trim_expired(db, now)
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int, version: int, expires_at: datetime) -> None:
+    """
+    Denies every token of the user issued with a version below `version`,
+    inside the caller's transaction (which must also store the new version).
+    The caller commits and then calls `revocation_list.deny_below_version`.
+    """
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        insert(RevokedToken).values(user_id=user_id, token_version=version, expires_at=expires_at, revoked_at=now)
+    )
+    await _trim_expired(db, now)
@@ -0,0 +1,78 @@
+import re
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, column, or_, text
+
+from models.product import Product
+
+# FTS5 index over products.name/description, created by migration 0002
+FTS_TABLE = "products_fts"
+
+# PostgreSQL: the expression behind the GIN index of migration 0002. Queries
+# must repeat it exactly for the planner to use the index.
+PG_SEARCH_VECTOR = "to_tsvector('simple', coalesce(products.name, '') || ' ' || coalesce(products.description, ''))"
+
+MAX_CODE_POINT = 0x10FFFF
+SURROGATES = range(0xD800, 0xE000)
+
+
+def _prefix_upper_bound(prefix: str):
+    """
+    Smallest string above every string starting with `prefix` in code point
+    order, or None when there is none (the prefix is all U+10FFFF).
+    """
+    while prefix and ord(prefix[-1]) == MAX_CODE_POINT:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if following in SURROGATES:
+        # Not encodable as UTF-8; the next code point that is
+        following = SURROGATES.stop
+    return prefix[:-1] + chr(following)
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_conditions(dialect_name: str, col, prefix: str) -> list:
+    """
+    Case-sensitive `col LIKE 'prefix%'` in a form an index can serve.
+
+    SQLite compares text in code point order (BINARY collation), so a half-open
+    range on a plain b-tree index is exact. Elsewhere the column collation may
+    not order by code point, so a range could miss matches; an escaped LIKE is
+    used instead, served by the text_pattern_ops indexes of migration 0002.
+    """
+    if dialect_name == "sqlite":
+        upper = _prefix_upper_bound(prefix)
+        return [col >= prefix] if upper is None else [col >= prefix, col < upper]
+    return [col.like(escape_like(prefix) + "%", escape="\\")]
+
+
+def text_search_conditions(dialect_name: str, q: str) -> list:
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain letters or digits")
+
+    if dialect_name == "sqlite":
+        # Each term is quoted (no FTS operators from user input) and prefix-matched
+        match = " ".join(f'"{term}"*' for term in terms)
+        matches = (
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query")
+            .bindparams(fts_query=match)
+            .columns(column("rowid", Integer))
+        )
+        return [Product.id.in_(matches)]
+
+    if dialect_name == "postgresql":
+        # \w+ terms carry no tsquery operators; each is prefix-matched, as in FTS5
+        query = " & ".join(f"{term}:*" for term in terms)
+        return [text(f"{PG_SEARCH_VECTOR} @@ to_tsquery('simple', :ts_query)").bindparams(ts_query=query)]
+
+    # Other backends: unindexed substring match on every term
+    return [
+        or_(Product.name.ilike(f"%{term}%"), Product.description.ilike(f"%{term}%"))
+        for term in terms
+    ]
@@ -0,0 +1,39 @@
+import os
+from typing import Optional, Sequence
+
+import orjson
+from dotenv import load_dotenv
+
+from schemas.product import ProductResponse
+
+load_dotenv()
+
+# Render product pages straight from row tuples with orjson; turn off to go
+# through ProductListResponse (e.g. to compare the two in a benchmark)
+FAST_LIST_SERIALIZATION = os.getenv("FAST_LIST_SERIALIZATION", "true").lower() in ("1", "true", "yes")
+
+# Field order of ProductResponse, which the fast path must reproduce exactly
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+
+
+def product_list_json(
+    rows: Sequence[tuple],
+    total: Optional[int],
+    page: int,
+    size: int,
+    total_pages: Optional[int],
+    next_cursor: Optional[str]
+) -> bytes:
+    """
+    Serializes a page of product rows (selected in PRODUCT_FIELDS order) to the
+    same bytes as ProductListResponse.model_dump_json(), without building a
+    model per row.
+    """
+    return orjson.dumps({
+        "products": [dict(zip(PRODUCT_FIELDS, row)) for row in rows],
+        "total": total,
+        "page": page,
+        "size": size,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
+    })
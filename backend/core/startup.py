@@ -0,0 +1,45 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from database import engine
+import migrations
+
+# Set by the process manager once it has initialised the database itself, so
+# workers started afterwards skip the work entirely
+SKIP_DB_INIT_ENV = "FIMONEY_SKIP_DB_INIT"
+# Turn off when migrations run as a separate deploy step (python -m migrations upgrade)
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+STARTUP_LOCK_FILE = os.getenv("STARTUP_LOCK_FILE", os.path.join(tempfile.gettempdir(), "fimoney-startup.lock"))
+
+
+@contextmanager
+def _startup_lock():
+    """
+    Cross-process lock so workers that start together (uvicorn --workers)
+    migrate the schema one at a time instead of racing on CREATE TABLE.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # Windows dev machines run a single process
+        yield
+        return
+
+    with open(STARTUP_LOCK_FILE, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_db() -> None:
+    with _startup_lock():
+        migrations.upgrade(engine)
+
+
+def init_db_once() -> None:
+    if os.getenv(SKIP_DB_INIT_ENV) or not RUN_MIGRATIONS_ON_STARTUP:
+        return
+    init_db()
@@ -0,0 +1,99 @@
+import os
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.inventory_summary import InventorySummary
+from models.product import Product
+
+load_dotenv()
+
+# Products with quantity at or below this count as low stock. Changing it
+# requires a rebuild (python manage.py rebuild-stats).
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "5"))
+
+UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def is_low_stock(quantity) -> bool:
+    return (quantity or 0) <= LOW_STOCK_THRESHOLD
+
+
+class SummaryChanges:
+    """
+    Collects the aggregate deltas of one transaction's product writes so they
+    can be applied with one upsert per affected type.
+    """
+
+    def __init__(self):
+        # type -> [product_count, total_quantity, total_value, low_stock_count]
+        self._deltas = defaultdict(lambda: [0, 0, 0.0, 0])
+
+    def product_added(self, type: str, quantity: int, price: float) -> None:
+        delta = self._deltas[type]
+        delta[0] += 1
+        delta[1] += quantity or 0
+        delta[2] += (quantity or 0) * price
+        delta[3] += int(is_low_stock(quantity))
+
+    def quantity_changed(self, type: str, price: float, old_quantity: int, new_quantity: int) -> None:
+        change = (new_quantity or 0) - (old_quantity or 0)
+        delta = self._deltas[type]
+        delta[1] += change
+        delta[2] += change * price
+        delta[3] += int(is_low_stock(new_quantity)) - int(is_low_stock(old_quantity))
+
+    async def apply(self, db: AsyncSession) -> None:
+        """
+        Applies the deltas inside the caller's transaction, so the summary
+        commits (or rolls back) together with the product writes.
+        """
+        upsert = UPSERT_DIALECTS[db.bind.dialect.name]
+        for type, (count, quantity, value, low) in self._deltas.items():
+            if not (count or quantity or value or low):
+                continue
+            stmt = upsert(InventorySummary).values(
+                type=type, product_count=count, total_quantity=quantity, total_value=value, low_stock_count=low
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[InventorySummary.type],
+                set_={
+                    "product_count": InventorySummary.product_count + stmt.excluded.product_count,
+                    "total_quantity": InventorySummary.total_quantity + stmt.excluded.total_quantity,
+                    "total_value": InventorySummary.total_value + stmt.excluded.total_value,
+                    "low_stock_count": InventorySummary.low_stock_count + stmt.excluded.low_stock_count,
+                }
+            )
+            await db.execute(stmt)
+        self._deltas.clear()
+
+
+def rebuild_summary(connection) -> int:
+    """
+    Recomputes every aggregate from the products table (fixing float drift or a
+    changed LOW_STOCK_THRESHOLD). Returns the number of types.
+    """
+    aggregates = select(
+        Product.type,
+        func.count(Product.id),
+        func.coalesce(func.sum(Product.quantity), 0),
+        func.coalesce(func.sum(Product.quantity * Product.price), 0.0),
+        func.sum(case((func.coalesce(Product.quantity, 0) <= LOW_STOCK_THRESHOLD, 1), else_=0)),
+    ).group_by(Product.type)
+
+    if connection.dialect.name == "postgresql":
+        # Hold product writers off until the new aggregates are committed
+        connection.exec_driver_sql("LOCK TABLE products IN SHARE MODE")
+    connection.execute(delete(InventorySummary))
+    result = connection.execute(
+        insert(InventorySummary).from_select(
+            ["type", "product_count", "total_quantity", "total_value", "low_stock_count"], aggregates
+        )
+    )
+    return result.rowcount
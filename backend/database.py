@@ -1,15 +1,132 @@
-from sqlalchemy import create_engine
+import asyncio
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+# Optional explicit async URL; derived from DATABASE_URL when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Requests that would wait longer than this for a pooled connection are shed
+# with 503 (DB_POOL_TIMEOUT still bounds scripts and background jobs)
+DB_POOL_SHED_SECONDS = float(os.getenv("DB_POOL_SHED_SECONDS", "2"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
+# "production": WAL journal, tuned pragmas and a single serialized writer.
+# "default": SQLite's stock rollback journal, writes share the main pool.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+# Async drivers used for the request path, keyed by the sync URL's backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    if ASYNC_DATABASE_URL:
+        return ASYNC_DATABASE_URL
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def engine_options(url: str) -> dict:
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "echo": DB_ECHO,
+    }
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def _use_explicit_transactions(dbapi_connection, connection_record):
+    # Take transaction control away from the driver so BEGIN can be IMMEDIATE
+    dbapi_connection.isolation_level = None
+
+def _begin_immediate(conn):
+    # Acquire the write lock up front: a deferred transaction that later
+    # upgrades to a writer fails with "database is locked" instead of waiting
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+SQLITE_PRODUCTION = is_sqlite(SQLALCHEMY_DATABASE_URL) and SQLITE_PROFILE == "production"
+
+
+# Sync engine: schema management, scripts and anything running outside the event loop
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+if SQLITE_PRODUCTION:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: used by the request handlers so DB I/O does not block the loop
+async_engine = create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL), **engine_options(SQLALCHEMY_DATABASE_URL)
+)
+
+# expire_on_commit=False so attributes stay readable after commit without
+# an implicit (and, under asyncio, illegal) refresh
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+ASYNC_POOL_CAPACITY = DB_POOL_SIZE + DB_MAX_OVERFLOW
+ASYNC_WRITE_POOL_CAPACITY = ASYNC_POOL_CAPACITY
+
+if SQLITE_PRODUCTION:
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+    # SQLite allows one writer at a time. Writes go through their own engine
+    # with a single pooled connection, so the pool checkout queue is the writer
+    # queue: in-process writers wait their turn (FIFO) instead of colliding, and
+    # BEGIN IMMEDIATE plus busy_timeout covers writers in other processes.
+    async_write_engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL),
+        **{**engine_options(SQLALCHEMY_DATABASE_URL), "pool_size": 1, "max_overflow": 0}
+    )
+    event.listen(async_write_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_write_engine.sync_engine, "connect", _use_explicit_transactions)
+    event.listen(async_write_engine.sync_engine, "begin", _begin_immediate)
+    ASYNC_WRITE_POOL_CAPACITY = 1
+else:
+    async_write_engine = async_engine
+
+AsyncWriteSessionLocal = async_sessionmaker(
+    bind=async_write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -17,4 +134,32 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def _checkout_or_shed(db: AsyncSession, capacity: int) -> None:
+    """
+    When every pooled connection is in use, takes one now with a deadline of
+    DB_POOL_SHED_SECONDS instead of letting the first query wait up to
+    DB_POOL_TIMEOUT. Otherwise the connection is taken lazily as usual, so
+    requests served from cache never touch the pool.
+    """
+    if db.bind.sync_engine.pool.checkedout() < capacity:
+        return
+    try:
+        await asyncio.wait_for(db.connection(), DB_POOL_SHED_SECONDS)
+    except asyncio.TimeoutError:
+        raise PoolTimeoutError(f"No database connection free within {DB_POOL_SHED_SECONDS}s")
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        await _checkout_or_shed(db, ASYNC_POOL_CAPACITY)
+        yield db
+
+async def get_async_write_db():
+    """
+    Session for handlers that write. Same as get_async_db except under the
+    SQLite production profile, where it goes through the serialized writer.
+    """
+    async with AsyncWriteSessionLocal() as db:
+        await _checkout_or_shed(db, ASYNC_WRITE_POOL_CAPACITY)
+        yield db
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings for the production server (uvicorn worker processes).
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Everything is configurable from the environment.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Graceful shutdown: workers get this long to finish in-flight requests
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Worker recycling bounds memory growth; jitter avoids all workers restarting
+# together. Off by default: background jobs run inside the workers, and a
+# recycled worker interrupts its running imports and exports.
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+def on_starting(server):
+    # Runs once in the master before any worker is forked
+    from core.startup import SKIP_DB_INIT_ENV, init_db
+    from database import engine
+
+    init_db()
+    # Never hand pooled connections over to forked workers
+    engine.dispose()
+    os.environ[SKIP_DB_INIT_ENV] = "1"
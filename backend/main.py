@@ -1,20 +1,53 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from database import engine
-from models.user import User
-from models.product import Product
+from database import async_engine, async_write_engine, engine
 
-from routers import auth, users, products
+from core.auth import shutdown_password_pool
+from core.jobs import job_runner
+from core.ledger import STOCK_SNAPSHOT_INTERVAL_SECONDS, run_snapshot_loop
+from core.compression import GZipMiddleware
+from core.instrumentation import RequestMetricsMiddleware, install_query_hooks
+from core.metrics import render_prometheus
+from core.ratelimit import LoadSheddingMiddleware, pool_timeout_handler
+from core.startup import init_db_once
+from routers import auth, users, products, jobs
 
-User.metadata.create_all(bind=engine)
-Product.metadata.create_all(bind=engine)
+# Schema setup; skipped in workers when the process manager already did it
+init_db_once()
+
+install_query_hooks(engine)
+install_query_hooks(async_engine.sync_engine)
+if async_write_engine is not async_engine:
+    install_query_hooks(async_write_engine.sync_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshot_task = None
+    if STOCK_SNAPSHOT_INTERVAL_SECONDS > 0:
+        snapshot_task = asyncio.create_task(run_snapshot_loop(STOCK_SNAPSHOT_INTERVAL_SECONDS))
+    job_runner.start()
+    yield
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    # Jobs still running here are recorded as failed (interrupted)
+    await job_runner.shutdown()
+    # Graceful shutdown: in-flight requests have drained by now
+    shutdown_password_pool()
+    await async_engine.dispose()
+    await async_write_engine.dispose()
+    engine.dispose()
 
 # Root app (serves only root or static if needed)
 app = FastAPI(
     title="FiMoney Root",
     description="Handles root-level routes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Sub API app mounted at /api
@@ -24,6 +57,13 @@ api_app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control (inside CORS, so 503s still carry CORS headers)
+# The live feed holds its connection open while mostly idle
+api_app.add_middleware(LoadSheddingMiddleware, exempt_suffixes=("/products/events",))
+
+# gzip for JSON/NDJSON/CSV bodies above COMPRESSION_MIN_SIZE (event streams pass through)
+api_app.add_middleware(GZipMiddleware)
+
 # CORS (for both frontend dev and production)
 api_app.add_middleware(
     CORSMiddleware,
@@ -33,10 +73,17 @@ api_app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and SQL statement counts (outermost, so it times everything)
+api_app.add_middleware(RequestMetricsMiddleware)
+
+# Timing out on the connection pool means the database is saturated: shed the request
+api_app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
 # Include routers in the API app
 api_app.include_router(auth.router)
 api_app.include_router(users.router)
 api_app.include_router(products.router)
+api_app.include_router(jobs.router)
 
 # Optional root endpoint for API
 @api_app.get("/", tags=["API Root"])
@@ -50,3 +97,8 @@ app.mount("/api", api_app)
 @app.get("/", tags=["Root"])
 def root():
     return {"message": "This is the base app. API is under /api"}
+
+# Prometheus scrape endpoint; kept off /api so the public proxy does not expose it
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
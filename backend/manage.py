@@ -0,0 +1,54 @@
+"""
+Maintenance commands.
+
+    python manage.py rebuild-stats
+    python manage.py snapshot-stock
+"""
+import argparse
+import sys
+
+from database import engine
+
+
+def _register_models():
+    # Relationships name their targets as strings (Product.creator, over the
+    # created_by column, targets "User"), so every mapper must be imported
+    # before the first query
+    from models import inventory_summary, job, product, revoked_token, stock_movement, user  # noqa: F401
+
+
+def rebuild_stats(args):
+    from core.stats import rebuild_summary
+
+    with engine.begin() as connection:
+        types = rebuild_summary(connection)
+    print(f"Rebuilt inventory summary for {types} product type(s)")
+
+
+def snapshot_stock(args):
+    from core.ledger import take_snapshots
+
+    with engine.begin() as connection:
+        snapshots = take_snapshots(connection)
+    print(f"Wrote {snapshots} stock snapshot(s)")
+
+
+COMMANDS = {
+    "rebuild-stats": (rebuild_stats, "Recompute the inventory summary from the products table"),
+    "snapshot-stock": (snapshot_stock, "Snapshot stock levels of products with new movements (run periodically)"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python manage.py", description="FiMoney maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        commands.add_parser(name, help=help_text)
+    args = parser.parse_args(argv)
+    _register_models()
+    COMMANDS[args.command][0](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Schema migrations.
+
+Each module in migrations/versions is one migration, applied in name order
+(0001_..., 0002_...). A migration defines `upgrade(connection)` and may define
+`downgrade(connection)`. Applied versions are recorded in `schema_migrations`.
+
+    python -m migrations status
+    python -m migrations upgrade [--to VERSION]
+    python -m migrations downgrade --to VERSION   # "base" reverts everything
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, delete, insert, select
+from sqlalchemy.engine import Engine
+
+from migrations import versions
+
+logger = logging.getLogger("fimoney.migrations")
+
+BASE = "base"
+
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", String(128), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def discover() -> list:
+    """
+    Returns the migration modules sorted by version (module name).
+    """
+    names = sorted(info.name for info in pkgutil.iter_modules(versions.__path__))
+    return [importlib.import_module(f"{versions.__name__}.{name}") for name in names]
+
+
+def version_of(module) -> str:
+    return module.__name__.rsplit(".", 1)[-1]
+
+
+def applied_versions(engine: Engine) -> list[str]:
+    with engine.begin() as connection:
+        schema_migrations.create(bind=connection, checkfirst=True)
+        return sorted(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _check_target(target, known: list[str]):
+    if target is not None and target != BASE and target not in known:
+        raise ValueError(f"Unknown migration version '{target}'")
+
+
+def upgrade(engine: Engine, target: str = None) -> list[str]:
+    """
+    Applies pending migrations up to and including `target` (all by default),
+    each in its own transaction. Returns the versions applied.
+    """
+    modules = discover()
+    _check_target(target, [version_of(m) for m in modules])
+    done = set(applied_versions(engine))
+    applied = []
+    for module in modules:
+        version = version_of(module)
+        if version not in done:
+            logger.info("Applying migration %s", version)
+            with engine.begin() as connection:
+                module.upgrade(connection)
+                connection.execute(
+                    insert(schema_migrations).values(version=version, applied_at=datetime.now(timezone.utc))
+                )
+            applied.append(version)
+        if version == target:
+            break
+    return applied
+
+
+def downgrade(engine: Engine, target: str) -> list[str]:
+    """
+    Reverts applied migrations newer than `target`, newest first.
+    """
+    modules = discover()
+    _check_target(target, [version_of(m) for m in modules])
+    done = set(applied_versions(engine))
+    reverted = []
+    for module in reversed(modules):
+        version = version_of(module)
+        if version == target:
+            break
+        if version not in done:
+            continue
+        if not hasattr(module, "downgrade"):
+            raise RuntimeError(f"Migration {version} cannot be reverted")
+        logger.info("Reverting migration %s", version)
+        with engine.begin() as connection:
+            module.downgrade(connection)
+            connection.execute(delete(schema_migrations).where(schema_migrations.c.version == version))
+        reverted.append(version)
+    return reverted
+
+
+def status(engine: Engine) -> list[tuple[str, bool]]:
+    done = set(applied_versions(engine))
+    return [(version_of(m), version_of(m) in done) for m in discover()]
@@ -0,0 +1,34 @@
+import argparse
+import logging
+import sys
+
+from database import engine
+from migrations import BASE, downgrade, status, upgrade
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Manage the database schema")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    up = commands.add_parser("upgrade", help="Apply pending migrations")
+    up.add_argument("--to", dest="target", help="Stop after this version")
+    down = commands.add_parser("downgrade", help="Revert migrations newer than a version")
+    down.add_argument("--to", dest="target", required=True, help=f"Version to return to ('{BASE}' for an empty schema)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"Database: {engine.url.render_as_string(hide_password=True)}")
+    if args.command == "status":
+        for version, applied in status(engine):
+            print(f"  [{'x' if applied else ' '}] {version}")
+    elif args.command == "upgrade":
+        applied = upgrade(engine, args.target)
+        print(f"Applied {len(applied)} migration(s)")
+    else:
+        reverted = downgrade(engine, args.target)
+        print(f"Reverted {len(reverted)} migration(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
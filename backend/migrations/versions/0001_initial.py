@@ -0,0 +1,37 @@
+"""
+Baseline schema: users and products as originally created by create_all.
+Uses checkfirst so databases created before migrations existed adopt it as-is.
+"""
+from sqlalchemy import Column, Float, ForeignKey, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+users = Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("username", String, unique=True, index=True),
+    Column("hashedpassword", String(255), nullable=False),
+)
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("name", String(100), nullable=False, index=True),
+    Column("type", String(50), nullable=False),
+    Column("sku", String(50), unique=True, nullable=False, index=True),
+    Column("image_url", String(255), nullable=True),
+    Column("description", Text, nullable=True),
+    Column("quantity", Integer, default=0),
+    Column("price", Float, nullable=False),
+    Column("created_by", Integer, ForeignKey("users.id"), nullable=False),
+)
+
+
+def upgrade(connection):
+    metadata.create_all(bind=connection, checkfirst=True)
+
+
+def downgrade(connection):
+    metadata.drop_all(bind=connection)
@@ -0,0 +1,111 @@
+"""
+Index tuning for products:
+- composite indexes behind the GET /products filter and sort combinations
+- drops ix_products_id, which duplicates the primary key index
+- SQLite: FTS5 index over name/description, kept in sync by triggers
+- PostgreSQL: GIN full-text index over name/description, and text_pattern_ops
+  indexes for the prefix filters (LIKE 'prefix%' under any collation)
+"""
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, inspect
+
+metadata = MetaData()
+
+products = Table(
+    "products",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("type", String(50)),
+    Column("quantity", Integer),
+    Column("price", Float),
+    Column("created_by", Integer),
+)
+
+INDEXES = [
+    Index("ix_products_type_price", products.c.type, products.c.price),
+    Index("ix_products_type_quantity", products.c.type, products.c.quantity),
+    Index("ix_products_created_by_id", products.c.created_by, products.c.id),
+    Index("ix_products_price_id", products.c.price, products.c.id),
+    Index("ix_products_quantity_id", products.c.quantity, products.c.id),
+]
+
+REDUNDANT_ID_INDEX = Index("ix_products_id", products.c.id)
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+        USING fts5(name, description, content='products', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    # Index rows that existed before the triggers
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS products_fts_au",
+    "DROP TRIGGER IF EXISTS products_fts_ad",
+    "DROP TRIGGER IF EXISTS products_fts_ai",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+
+# The expression must match PG_SEARCH_VECTOR in core/search.py
+POSTGRES_DDL = [
+    """CREATE INDEX IF NOT EXISTS ix_products_search ON products USING gin
+        (to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, '')))""",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_pattern ON products (name text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_pattern ON products (sku text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_pattern ON users (username text_pattern_ops)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS ix_users_username_pattern",
+    "DROP INDEX IF EXISTS ix_products_sku_pattern",
+    "DROP INDEX IF EXISTS ix_products_name_pattern",
+    "DROP INDEX IF EXISTS ix_products_search",
+]
+
+
+def _existing_indexes(connection) -> set:
+    return {index["name"] for index in inspect(connection).get_indexes("products")}
+
+
+def upgrade(connection):
+    existing = _existing_indexes(connection)
+    for index in INDEXES:
+        if index.name not in existing:
+            index.create(bind=connection)
+    if REDUNDANT_ID_INDEX.name in existing:
+        REDUNDANT_ID_INDEX.drop(bind=connection)
+
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DDL:
+            connection.exec_driver_sql(statement)
+    elif connection.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+    # Other backends fall back to ILIKE search (see core/search.py)
+
+
+def downgrade(connection):
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_FTS_DROP:
+            connection.exec_driver_sql(statement)
+    elif connection.dialect.name == "postgresql":
+        for statement in POSTGRES_DROP:
+            connection.exec_driver_sql(statement)
+
+    existing = _existing_indexes(connection)
+    if REDUNDANT_ID_INDEX.name not in existing:
+        REDUNDANT_ID_INDEX.create(bind=connection)
+    for index in INDEXES:
+        if index.name in existing:
+            index.drop(bind=connection)
@@ -0,0 +1,40 @@
+"""
+Per-type inventory aggregates backing GET /products/stats, seeded from the
+existing products.
+"""
+import os
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+inventory_summary = Table(
+    "inventory_summary",
+    metadata,
+    Column("type", String(50), primary_key=True),
+    Column("product_count", Integer, nullable=False, default=0),
+    Column("total_quantity", Integer, nullable=False, default=0),
+    Column("total_value", Float, nullable=False, default=0.0),
+    Column("low_stock_count", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(connection):
+    inventory_summary.create(bind=connection, checkfirst=True)
+    threshold = int(os.getenv("LOW_STOCK_THRESHOLD", "5"))
+    connection.exec_driver_sql(
+        """
+        INSERT INTO inventory_summary (type, product_count, total_quantity, total_value, low_stock_count)
+        SELECT type,
+               COUNT(*),
+               COALESCE(SUM(quantity), 0),
+               COALESCE(SUM(quantity * price), 0),
+               SUM(CASE WHEN COALESCE(quantity, 0) <= %d THEN 1 ELSE 0 END)
+        FROM products
+        GROUP BY type
+        """ % threshold
+    )
+
+
+def downgrade(connection):
+    inventory_summary.drop(bind=connection)
@@ -0,0 +1,52 @@
+"""
+Stock movement ledger and snapshots. Every existing product gets an initial
+snapshot of its current quantity, so history queries have a starting point.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, literal, select
+
+metadata = MetaData()
+
+products = Table("products", metadata, Column("id", Integer, primary_key=True), Column("quantity", Integer))
+users = Table("users", metadata, Column("id", Integer, primary_key=True))
+
+stock_movements = Table(
+    "stock_movements",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("delta", Integer, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=True),
+    Column("reason", String(20), nullable=False),
+    Column("ts", DateTime(timezone=True), nullable=False),
+    Index("ix_stock_movements_product_id_ts", "product_id", "ts"),
+)
+
+stock_snapshots = Table(
+    "stock_snapshots",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("product_id", Integer, ForeignKey("products.id"), nullable=False),
+    Column("movement_id", Integer, nullable=False, default=0),
+    Column("quantity", Integer, nullable=False),
+    Column("ts", DateTime(timezone=True), nullable=False),
+    Index("ix_stock_snapshots_product_id_ts", "product_id", "ts"),
+)
+
+
+def upgrade(connection):
+    stock_movements.create(bind=connection, checkfirst=True)
+    stock_snapshots.create(bind=connection, checkfirst=True)
+    now = datetime.now(timezone.utc)
+    connection.execute(
+        stock_snapshots.insert().from_select(
+            ["product_id", "movement_id", "quantity", "ts"],
+            select(products.c.id, literal(0), products.c.quantity, literal(now, DateTime(timezone=True))).where(products.c.quantity.is_not(None)),
+        )
+    )
+
+
+def downgrade(connection):
+    stock_snapshots.drop(bind=connection)
+    stock_movements.drop(bind=connection)
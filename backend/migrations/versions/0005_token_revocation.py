@@ -0,0 +1,31 @@
+"""
+Token revocation: users.token_version (carried in access tokens) and the
+revoked_tokens denylist.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+users = Table("users", metadata, Column("id", Integer, primary_key=True))
+
+revoked_tokens = Table(
+    "revoked_tokens",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("jti", String(64), nullable=True, unique=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("token_version", Integer, nullable=True),
+    Column("expires_at", DateTime(timezone=True), nullable=False),
+    Column("revoked_at", DateTime(timezone=True), nullable=False),
+    Index("ix_revoked_tokens_expires_at", "expires_at"),
+)
+
+
+def upgrade(connection):
+    connection.exec_driver_sql("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+    revoked_tokens.create(bind=connection, checkfirst=True)
+
+
+def downgrade(connection):
+    revoked_tokens.drop(bind=connection)
+    connection.exec_driver_sql("ALTER TABLE users DROP COLUMN token_version")
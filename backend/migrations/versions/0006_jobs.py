@@ -0,0 +1,38 @@
+"""
+Background jobs table.
+"""
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+users = Table("users", metadata, Column("id", Integer, primary_key=True))
+
+jobs = Table(
+    "jobs",
+    metadata,
+    Column("id", String(32), primary_key=True),
+    Column("kind", String(50), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("params", Text, nullable=True),
+    Column("result", Text, nullable=True),
+    Column("result_path", String(255), nullable=True),
+    Column("error", Text, nullable=True),
+    Column("progress_done", Integer, nullable=False, default=0),
+    Column("progress_total", Integer, nullable=True),
+    Column("cancel_requested", Boolean, nullable=False, default=False),
+    Column("created_by", Integer, ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("started_at", DateTime(timezone=True), nullable=True),
+    Column("finished_at", DateTime(timezone=True), nullable=True),
+    Column("heartbeat_at", DateTime(timezone=True), nullable=True),
+    Index("ix_jobs_created_by_created_at", "created_by", "created_at"),
+    Index("ix_jobs_status_heartbeat_at", "status", "heartbeat_at"),
+)
+
+
+def upgrade(connection):
+    jobs.create(bind=connection, checkfirst=True)
+
+
+def downgrade(connection):
+    jobs.drop(bind=connection)
@@ -0,0 +1,11 @@
+"""
+Quantity after each stock movement, published by the stock change feed.
+"""
+
+
+def upgrade(connection):
+    connection.exec_driver_sql("ALTER TABLE stock_movements ADD COLUMN quantity_after INTEGER")
+
+
+def downgrade(connection):
+    connection.exec_driver_sql("ALTER TABLE stock_movements DROP COLUMN quantity_after")
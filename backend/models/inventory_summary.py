@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Float
+from database import Base
+
+# Running per-type aggregates over products, maintained incrementally by the
+# product write paths (core/stats.py) and rebuildable from the products table
+class InventorySummary(Base):
+    __tablename__ = 'inventory_summary'
+
+    type = Column(String(50), primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    total_quantity = Column(Integer, nullable=False, default=0)
+    total_value = Column(Float, nullable=False, default=0.0)
+    low_stock_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
+from database import Base
+
+# Background jobs (core/jobs.py). Rows outlive the process that ran them, so
+# status and results survive restarts and are visible to every worker.
+class Job(Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_created_by_created_at', 'created_by', 'created_at'),
+        Index('ix_jobs_status_heartbeat_at', 'status', 'heartbeat_at'),
+    )
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)
+    params = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)
+    result_path = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_by = Column(Integer, ForeignKey('users.id'), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed by the owning worker while the job is queued or running
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,11 +1,19 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Filter/sort combinations served by GET /products (migration 0002)
+        Index('ix_products_type_price', 'type', 'price'),
+        Index('ix_products_type_quantity', 'type', 'quantity'),
+        Index('ix_products_created_by_id', 'created_by', 'id'),
+        Index('ix_products_price_id', 'price', 'id'),
+        Index('ix_products_quantity_id', 'quantity', 'id'),
+    )
     
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False, index=True)
     type = Column(String(50), nullable=False)
     sku = Column(String(50), unique=True, nullable=False, index=True)
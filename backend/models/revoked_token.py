@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from database import Base
+
+# Token revocations still inside the token lifetime. A row either denies one
+# token (jti) or every token of the user issued below token_version.
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(64), nullable=True, unique=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    token_version = Column(Integer, nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=False)
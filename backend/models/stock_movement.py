@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from database import Base
+
+# Append-only ledger: one row per quantity change, written in the same
+# transaction as the change itself
+class StockMovement(Base):
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        Index('ix_stock_movements_product_id_ts', 'product_id', 'ts'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    delta = Column(Integer, nullable=False)
+    # Null for movements recorded before migration 0007
+    quantity_after = Column(Integer, nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    reason = Column(String(20), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
+
+
+# Periodic per-product quantity checkpoints: the quantity after every
+# movement up to and including movement_id
+class StockSnapshot(Base):
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        Index('ix_stock_snapshots_product_id_ts', 'product_id', 'ts'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    movement_id = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
@@ -7,6 +7,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String, unique=True, index=True)
     hashedpassword = Column(String(255), nullable=False)
+    # Embedded in access tokens; bumping it revokes every token issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationship
     products = relationship("Product", back_populates="creator")
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 
-from database import get_db
-from core.auth import authenticate_user, create_access_token, get_password_hash
+from database import get_async_db, get_async_write_db
+from core.auth import (
+    authenticate_user, create_access_token, decode_token, get_current_user, get_password_hash_async,
+    invalidate_user, oauth2_scheme, token_claims, verify_password_async
+)
+from core.ratelimit import rate_limit
+from core.revocation import revocation_list, revoke_token, revoke_user_tokens
 from models.user import User
-from schemas.user import UserCreate, UserLogin, Token
+from schemas.user import PasswordChange, UserCreate, UserLogin, Token
 
 # Load environment variables
 load_dotenv()
@@ -17,37 +24,49 @@ ACCESS_TOKEN_EXPIRE_MINUTE = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTE", "30"))
 
 router = APIRouter(tags=["Authentication"])
 
-@router.post("/register")
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+@router.post("/register", dependencies=[Depends(rate_limit("register", per="ip"))])
+async def register_user(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+    write_db: AsyncSession = Depends(get_async_write_db)
+):
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    result = await db.execute(select(User).where(User.username == user.username))
+    existing_user = result.scalar_one_or_none()
     if existing_user:
         return JSONResponse(
             status_code=400,
             content={"message": "Username already taken"}
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user. Hash before opening the write transaction so the
+    # writer is never held for the duration of a bcrypt round.
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         hashedpassword=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    write_db.add(db_user)
+    try:
+        await write_db.commit()
+    except IntegrityError:
+        await write_db.rollback()
+        return JSONResponse(
+            status_code=400,
+            content={"message": "Username already taken"}
+        )
     
     return JSONResponse(
         status_code=201,
         content={"message": f"User created successfully with username: {user.username}"}
     )
 
-@router.post("/login", response_model=Token)
-async def login_with_json(user_login: UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit("login", per="ip"))])
+async def login_with_json(user_login: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Login with username and password
     """
-    user = authenticate_user(user_login.username, user_login.password, db)
+    user = await authenticate_user(user_login.username, user_login.password, db)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -55,19 +74,19 @@ async def login_with_json(user_login: UserLogin, db: Session = Depends(get_db)):
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTE)
     access_token = create_access_token(
-        data={"id": user.id}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/login-oauth2", response_model=Token)
+@router.post("/login-oauth2", response_model=Token, dependencies=[Depends(rate_limit("login", per="ip"))])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     OAuth2 compatible login (for Swagger UI authorization)
     """
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -76,6 +95,75 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTE)
     access_token = create_access_token(
-        data={"id": user.id}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+async def _revoke_all_tokens(write_db: AsyncSession, user_id: int, **values) -> None:
+    """
+    Bumps the user's token version (plus any other column in `values`) and
+    records the revocation, so every worker rejects the older tokens.
+    """
+    version = (await write_db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1, **values)
+        .returning(User.token_version)
+        .execution_options(synchronize_session=False)
+    )).scalar_one()
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTE)
+    await revoke_user_tokens(write_db, user_id, version, expires_at)
+    await write_db.commit()
+    # Core UPDATE skips the ORM events that normally evict the cached user
+    invalidate_user(user_id)
+    revocation_list.deny_below_version(user_id, version)
+
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    write_db: AsyncSession = Depends(get_async_write_db)
+):
+    """
+    Revokes the token used for this request
+    """
+    payload = decode_token(token)
+    if payload.get("jti") is None:
+        raise HTTPException(status_code=400, detail="Token has no id to revoke; use /logout-all")
+    await revoke_token(
+        write_db, payload["jti"], current_user.id, datetime.fromtimestamp(payload["exp"], timezone.utc)
+    )
+    await write_db.commit()
+    revocation_list.deny_jti(payload["jti"])
+    return {"message": "Logged out"}
+
+@router.post("/logout-all")
+async def logout_everywhere(
+    current_user: User = Depends(get_current_user),
+    write_db: AsyncSession = Depends(get_async_write_db)
+):
+    """
+    Revokes every token issued to the current user
+    """
+    await _revoke_all_tokens(write_db, current_user.id)
+    return {"message": "Logged out of all sessions"}
+
+@router.post("/change-password", dependencies=[Depends(rate_limit("login"))])
+async def change_password(
+    password_change: PasswordChange,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    write_db: AsyncSession = Depends(get_async_write_db)
+):
+    """
+    Changes the password and revokes every existing token; log in again afterwards
+    """
+    hashed_password = await db.scalar(select(User.hashedpassword).where(User.id == current_user.id))
+    if hashed_password is None or not await verify_password_async(password_change.current_password, hashed_password):
+        raise HTTPException(status_code=400, detail="Current password is incorrect")
+
+    # Hash before opening the write transaction, as in register_user
+    new_hash = await get_password_hash_async(password_change.new_password)
+    await _revoke_all_tokens(write_db, current_user.id, hashedpassword=new_hash)
+    return {"message": "Password changed; please log in again"}
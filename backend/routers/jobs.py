@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import ValidationError
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime
+import json
+import os
+
+from database import engine, get_async_db
+from core.auth import get_current_user
+from core.jobs import ACTIVE_STATUSES, JOB_HANDLERS, SUCCEEDED, is_job_admin, job_handler, job_runner
+from core.ledger import as_utc, take_snapshots
+from core.ratelimit import rate_limit
+from core.pagination import decode_cursor, next_cursor_for
+from core.stats import rebuild_summary
+from models.job import Job
+from models.user import User
+from schemas.job import JobListResponse, JobResponse, JobSubmit, NoJobParams
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def _in_transaction(fn):
+    with engine.begin() as connection:
+        return fn(connection)
+
+# Both act on the whole catalogue, so only JOB_ADMIN_USERS may start them
+@job_handler("rebuild-stats", NoJobParams, admin_only=True)
+async def _rebuild_stats_job(ctx, params):
+    return {"types": await ctx.run_sync(_in_transaction, rebuild_summary)}
+
+@job_handler("snapshot-stock", NoJobParams, admin_only=True)
+async def _snapshot_stock_job(ctx, params):
+    return {"snapshots": await ctx.run_sync(_in_transaction, take_snapshots)}
+
+
+async def _get_own_job(db: AsyncSession, job_id: str, user: User) -> Job:
+    job = await db.get(Job, job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if job is None or job.created_by != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/", response_model=JobResponse, status_code=202, dependencies=[Depends(rate_limit("bulk"))], summary="Start a maintenance job")
+async def submit_job(
+    submission: JobSubmit,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Returns immediately with the job id; poll GET /jobs/{job_id} for progress.
+    """
+    handler = JOB_HANDLERS.get(submission.kind)
+    if handler is None or handler.params_model is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{submission.kind}'")
+    if handler.admin_only and not is_job_admin(current_user):
+        raise HTTPException(status_code=403, detail=f"Not authorized to start '{submission.kind}' jobs")
+    try:
+        params = handler.params_model.model_validate(submission.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    return await job_runner.submit(submission.kind, params.model_dump(), current_user.id)
+
+@router.get("/", response_model=JobListResponse, summary="Jobs submitted by the current user, newest first")
+async def list_jobs(
+    size: int = Query(20, ge=1, le=100, description="Number of jobs per page"),
+    after: Optional[str] = Query(None, description="Opaque cursor from a previous `next_cursor`"),
+    status: Optional[str] = Query(None, description="Only jobs in this status"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = (
+        select(Job)
+        .where(Job.created_by == current_user.id)
+        .order_by(Job.created_at.desc(), Job.id.desc())
+    )
+    if status is not None:
+        query = query.where(Job.status == status)
+    if after is not None:
+        values = decode_cursor(after, "created_at")
+        try:
+            created_at, job_id = datetime.fromisoformat(values[0]), str(values[1])
+        except (ValueError, TypeError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        query = query.where(tuple_(Job.created_at, Job.id) < tuple_(as_utc(created_at), job_id))
+
+    result = await db.execute(query.limit(size + 1))
+    rows = result.scalars().all()
+    return JobListResponse(
+        jobs=rows[:size],
+        size=size,
+        next_cursor=next_cursor_for(rows, size, "created_at", lambda j: [as_utc(j.created_at).isoformat(), j.id])
+    )
+
+@router.get("/{job_id}", response_model=JobResponse, summary="Status and progress of a job")
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await _get_own_job(db, job_id, current_user)
+
+@router.post("/{job_id}/cancel", response_model=JobResponse, summary="Cancel a queued or running job")
+async def cancel_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queued jobs stop at once. A running job stops at its next progress report;
+    work it already committed (e.g. imported chunks) is kept.
+    """
+    job = await _get_own_job(db, job_id, current_user)
+    if job.status not in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    await job_runner.cancel(job_id)
+    # End the read transaction so the refresh sees the cancellation
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+@router.get("/{job_id}/result", summary="Result of a finished job (JSON or a file download)")
+async def get_job_result(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await _get_own_job(db, job_id, current_user)
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; no result available")
+
+    result = json.loads(job.result) if job.result else None
+    if job.result_path is not None:
+        if not os.path.exists(job.result_path):
+            raise HTTPException(status_code=410, detail="Result file is no longer available")
+        return FileResponse(
+            job.result_path,
+            media_type=(result or {}).get("media_type"),
+            filename=(result or {}).get("filename")
+        )
+    return JSONResponse(content=result)
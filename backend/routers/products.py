@@ -1,24 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from typing import List
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
+import csv
+import io
+import json
 import math
+import os
 
-from database import get_db
-from core.auth import get_current_user
+from database import AsyncSessionLocal, AsyncWriteSessionLocal, get_async_db, get_async_write_db
+from core.auth import get_current_user, get_current_user_and_token
+from core.feed import FeedFilter, stock_feed, stream_events
+from core.ledger import StockMovements, as_utc, quantity_at
+from core import serialization
+from core.jobs import job_file, job_handler, job_runner, new_job_id, remove_file
+from core.ingest import iter_csv_records, iter_ndjson_records
+from core.ratelimit import rate_limit
+from core.pagination import decode_cursor, next_cursor_for
+from core.response_cache import cached_json_response, response_cache
+from core.search import prefix_conditions, text_search_conditions
+from core.stats import LOW_STOCK_THRESHOLD, SummaryChanges
 from models.user import User
 from models.product import Product
-from schemas.product import ProductCreate, ProductCreateResponse, ProductQuantityUpdate, ProductResponse, ProductListResponse
+from models.inventory_summary import InventorySummary
+from models.stock_movement import StockMovement
+from schemas.job import JobResponse
+from schemas.product import (
+    InventoryStatsResponse, ProductTypeStats, ProductCreate, ProductCreateResponse, ProductImportError, ProductImportResponse,
+    ProductQuantityBatchResponse, ProductQuantityBatchUpdate, ProductQuantityResult,
+    ProductLookupRequest, ProductLookupResponse, ProductQuantityUpdate, ProductResponse, ProductListResponse, StockLevelResponse, StockMovementListResponse
+)
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
-@router.post("/", response_model=ProductCreateResponse, status_code=201)
+@router.post("/", response_model=ProductCreateResponse, status_code=201, dependencies=[Depends(rate_limit("write"))])
 async def add_product(
     product: ProductCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_write_db),
     current_user: User = Depends(get_current_user)
 ):
-    existing_product = db.query(Product).filter(Product.sku == product.sku).first()
+    result = await db.execute(select(Product.id).where(Product.sku == product.sku))
+    existing_product = result.scalar_one_or_none()
     if existing_product:
         raise HTTPException(status_code=400, detail=f"Product with SKU '{product.sku}' already exists")
     
@@ -34,76 +62,706 @@ async def add_product(
             created_by=current_user.id
         )
         db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
+        # Flush for the id the ledger row points at
+        await db.flush()
+        movements = StockMovements(current_user.id, "create")
+        movements.record(db_product.id, 0, product.quantity, always=True)
+        await movements.apply(db)
+        changes = SummaryChanges()
+        changes.product_added(product.type, product.quantity, product.price)
+        await changes.apply(db)
+        await db.commit()
+        response_cache.invalidate_lists()
+        stock_feed.notify()
         
         return ProductCreateResponse(
             product_id=db_product.id,
             message=f"Product '{db_product.name}' created successfully"
         )
     except IntegrityError as e:
-        db.rollback()
+        await db.rollback()
         error_str = str(e.orig) if hasattr(e, 'orig') else str(e)
-        if "UNIQUE constraint failed" in error_str:
+        if "UNIQUE constraint failed" in error_str or "duplicate key" in error_str:
             raise HTTPException(status_code=400, detail=f"Product with SKU '{product.sku}' already exists")
         else:
             raise HTTPException(status_code=400, detail=f"Product creation failed: {error_str}")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
 
+IMPORT_MAX_ERRORS = 1000
+
+IMPORT_FORMATS = {
+    "csv": iter_csv_records,
+    "ndjson": iter_ndjson_records,
+}
+
+def _import_format_from_content_type(content_type: str) -> Optional[str]:
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        return "ndjson"
+    return None
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
+async def _insert_import_batch(
+    db: AsyncSession,
+    batch: list[tuple[int, ProductCreate]],
+    user_id: int,
+    report: ProductImportResponse
+):
+    """
+    Inserts one chunk of validated rows: a single IN query to find SKUs that
+    already exist, one executemany INSERT (plus one for the stock ledger) and
+    one commit.
+    """
+    for attempt in range(2):
+        result = await db.execute(
+            select(Product.sku).where(Product.sku.in_({item.sku for _, item in batch}))
+        )
+        existing = set(result.scalars().all())
+
+        rows, rejected, seen = [], [], set()
+        for row_number, item in batch:
+            if item.sku in existing or item.sku in seen:
+                rejected.append((row_number, item.sku, f"Product with SKU '{item.sku}' already exists"))
+                continue
+            seen.add(item.sku)
+            rows.append({**item.model_dump(), "created_by": user_id})
+
+        try:
+            if rows:
+                created = await db.execute(insert(Product).returning(Product.id, Product.quantity), rows)
+                movements = StockMovements(user_id, "import")
+                for product_id, quantity in created:
+                    movements.record(product_id, 0, quantity, always=True)
+                await movements.apply(db)
+                changes = SummaryChanges()
+                for row in rows:
+                    changes.product_added(row["type"], row["quantity"], row["price"])
+                await changes.apply(db)
+            await db.commit()
+            if rows:
+                response_cache.invalidate_lists()
+                stock_feed.notify()
+            break
+        except IntegrityError as e:
+            # A concurrent writer inserted one of our SKUs between the check
+            # and the insert; re-check once before giving up on the chunk
+            await db.rollback()
+            if attempt == 1:
+                error_str = str(e.orig) if hasattr(e, 'orig') else str(e)
+                rows = []
+                rejected = [(row_number, item.sku, f"Import failed: {error_str}") for row_number, item in batch]
+
+    report.created += len(rows)
+    for row_number, sku, message in rejected:
+        _record_import_error(report, row_number, sku, message)
+
+def _record_import_error(report: ProductImportResponse, row: int, sku: Optional[str], message: str):
+    report.failed += 1
+    if len(report.errors) < IMPORT_MAX_ERRORS:
+        report.errors.append(ProductImportError(row=row, sku=sku, error=message))
+    else:
+        report.errors_truncated = True
+
+async def _import_records(
+    chunks,
+    format: str,
+    chunk_size: int,
+    db: AsyncSession,
+    user_id: int,
+    after_chunk=None
+) -> ProductImportResponse:
+    """
+    Validates the records read from `chunks` (an async iterator of bytes) and
+    inserts them `chunk_size` at a time. `after_chunk(report)` is awaited after
+    each committed chunk.
+    """
+    report = ProductImportResponse(processed=0, created=0, failed=0, errors=[])
+    batch: list[tuple[int, ProductCreate]] = []
+
+    try:
+        async for row_number, record, parse_error in IMPORT_FORMATS[format](chunks):
+            report.processed += 1
+            if parse_error is not None:
+                _record_import_error(report, row_number, None, parse_error)
+                continue
+            try:
+                item = ProductCreate.model_validate(record)
+            except ValidationError as e:
+                sku = record.get("sku")
+                _record_import_error(report, row_number, str(sku) if sku is not None else None, _validation_message(e))
+                continue
+
+            batch.append((row_number, item))
+            if len(batch) >= chunk_size:
+                await _insert_import_batch(db, batch, user_id, report)
+                batch = []
+                if after_chunk is not None:
+                    await after_chunk(report)
+    except ValueError as e:
+        # Undecodable body or unusable CSV header: keep what was committed so far
+        _record_import_error(report, report.processed + 1, None, str(e))
+
+    if batch:
+        await _insert_import_batch(db, batch, user_id, report)
+    return report
+
+IMPORT_READ_SIZE = 64 * 1024
+
+def _remove_spooled_import(params):
+    remove_file(params["path"])
+
+@job_handler("import-products", cleanup=_remove_spooled_import)
+async def _import_products_job(ctx, params):
+    """
+    Imports a body spooled to disk by POST /products/import?background=true.
+    Progress is reported in bytes of the file.
+    """
+    path = params["path"]
+    total = os.path.getsize(path)
+    read = 0
+
+    async def chunks():
+        nonlocal read
+        with open(path, "rb") as f:
+            while chunk := f.read(IMPORT_READ_SIZE):
+                read += len(chunk)
+                yield chunk
+
+    async def report_progress(report):
+        await ctx.progress(read, total)
+
+    async with AsyncWriteSessionLocal() as db:
+        report = await _import_records(chunks(), params["format"], params["chunk_size"], db, ctx.user_id, report_progress)
+    return report.model_dump()
+
+@router.post("/import", response_model=ProductImportResponse, dependencies=[Depends(rate_limit("bulk"))], summary="Bulk import products from a CSV or NDJSON stream")
+async def import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Body format; inferred from Content-Type when omitted"),
+    chunk_size: int = Query(1000, ge=1, le=5000, description="Rows validated and inserted per transaction"),
+    background: bool = Query(False, description="Store the body and import it as a background job (202 with the job)"),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams the request body, validates each row against ProductCreate and
+    inserts valid rows in chunks. Rows with invalid data or an existing SKU are
+    skipped and listed in the per-row error report. With `background=true`
+    the report becomes the job result (GET /jobs/{job_id}/result).
+    """
+    if format is None:
+        format = _import_format_from_content_type(request.headers.get("content-type", ""))
+    if format is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+
+    if background:
+        job_id = new_job_id()
+        path = job_file(job_id, f".{format}")
+        try:
+            f = await run_in_threadpool(open, path, "wb")
+            try:
+                async for chunk in request.stream():
+                    await run_in_threadpool(f.write, chunk)
+            finally:
+                await run_in_threadpool(f.close)
+            job = await job_runner.submit(
+                "import-products", {"path": path, "format": format, "chunk_size": chunk_size}, current_user.id, job_id=job_id
+            )
+        except BaseException:
+            # No job will ever pick the upload up
+            await run_in_threadpool(remove_file, path)
+            raise
+        return JSONResponse(status_code=202, content=JobResponse.model_validate(job).model_dump(mode="json"))
+
+    return await _import_records(request.stream(), format, chunk_size, db, current_user.id)
+
+
+# Keyset sort options: each maps to the columns the cursor is built from.
+# Every option is backed by an index ending in id (the single-column name
+# index implicitly carries the rowid on SQLite).
+PRODUCT_SORT_KEYS = {
+    "id": (Product.id,),
+    "name": (Product.name, Product.id),
+    "price": (Product.price, Product.id),
+    "quantity": (Product.quantity, Product.id),
+}
+
+# Columns selected by the fast list path, in ProductResponse field order
+PRODUCT_COLUMNS = [getattr(Product, field) for field in serialization.PRODUCT_FIELDS]
+
+
 @router.get("/", response_model=ProductListResponse, summary="Get all the products with pagination")
 async def get_products(
-    page: int = Query(1, ge=1, description="Page number"),
+    request: Request,
+    page: int = Query(1, ge=1, description="Page number (ignored when `after` is given)"),
     size: int = Query(10, ge=1, le=100, description="Number of items per page"),
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Opaque cursor from a previous `next_cursor`; switches to keyset pagination"),
+    sort: Literal["id", "name", "price", "quantity"] = Query("id", description="Sort key for the listing"),
+    include_total: Optional[bool] = Query(None, description="Count matching products; defaults to true for page mode and false for cursor mode"),
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Full-text search over name and description"),
+    name: Optional[str] = Query(None, min_length=1, max_length=100, description="Name prefix"),
+    sku_prefix: Optional[str] = Query(None, min_length=1, max_length=50, description="SKU prefix"),
+    type: Optional[str] = Query(None, description="Exact product type"),
+    created_by: Optional[int] = Query(None, description="Only products created by this user id"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price (inclusive)"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price (inclusive)"),
+    max_quantity: Optional[int] = Query(None, ge=0, description="Low-stock threshold: quantity at or below this value"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    offset = (page - 1) * size
-    
-    total = db.query(Product).count()
-    products = db.query(Product).offset(offset).limit(size).all()
-    total_pages = math.ceil(total / size)
-    
-    return ProductListResponse(
-        products=products,
-        total=total,
-        page=page,
-        size=size,
-        total_pages=total_pages
+    cache_key = response_cache.list_key(request)
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_json_response(request, entry)
+    stamp = response_cache.current_stamp()
+
+    conditions = []
+    if q is not None:
+        conditions.extend(text_search_conditions(db.bind.dialect.name, q))
+    if name is not None:
+        conditions.extend(prefix_conditions(db.bind.dialect.name, Product.name, name))
+    if sku_prefix is not None:
+        conditions.extend(prefix_conditions(db.bind.dialect.name, Product.sku, sku_prefix))
+    if type is not None:
+        conditions.append(Product.type == type)
+    if created_by is not None:
+        conditions.append(Product.created_by == created_by)
+    if min_price is not None:
+        conditions.append(Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(Product.price <= max_price)
+    if max_quantity is not None:
+        conditions.append(Product.quantity <= max_quantity)
+
+    sort_columns = PRODUCT_SORT_KEYS[sort]
+    # Plain row tuples skip the identity map and the per-object model validation
+    fast = serialization.FAST_LIST_SERIALIZATION
+    query = select(*PRODUCT_COLUMNS) if fast else select(Product)
+    query = query.where(*conditions).order_by(*sort_columns)
+
+    if after is not None:
+        values = decode_cursor(after, sort, sort_columns)
+        query = query.where(tuple_(*sort_columns) > tuple_(*values))
+    else:
+        query = query.offset((page - 1) * size)
+
+    # One extra row tells us whether there is a next page without counting
+    result = await db.execute(query.limit(size + 1))
+    rows = result.all() if fast else result.scalars().all()
+    next_cursor = next_cursor_for(
+        rows, size, sort, lambda p: [getattr(p, c.key) for c in sort_columns]
+    )
+
+    if include_total is None:
+        include_total = after is None
+    total = await db.scalar(select(func.count(Product.id)).where(*conditions)) if include_total else None
+
+    total_pages = math.ceil(total / size) if total is not None else None
+    if fast:
+        body = serialization.product_list_json(rows[:size], total, page, size, total_pages, next_cursor)
+    else:
+        body = ProductListResponse(
+            products=rows[:size],
+            total=total,
+            page=page,
+            size=size,
+            total_pages=total_pages,
+            next_cursor=next_cursor
+        ).model_dump_json().encode()
+    entry = response_cache.store(cache_key, body, stamp)
+    return cached_json_response(request, entry)
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = list(ProductResponse.model_fields)
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+async def _stream_product_export(query, format: str, on_rows=None):
+    """
+    Streams the query through a server-side cursor, one partition of
+    EXPORT_BATCH_SIZE rows at a time, so memory stays flat regardless of
+    catalogue size. Uses its own session because the response body is
+    produced after the request's dependencies have been torn down.
+    `on_rows(count)` is awaited after each partition.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            yield buffer.getvalue()
+
+        async for rows in result.partitions():
+            if format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+            if on_rows is not None:
+                await on_rows(len(rows))
+
+def _export_query(type: Optional[str], created_by: Optional[int]):
+    query = select(*(getattr(Product, field) for field in EXPORT_FIELDS)).order_by(Product.id)
+    if type is not None:
+        query = query.where(Product.type == type)
+    if created_by is not None:
+        query = query.where(Product.created_by == created_by)
+    return query
+
+class ExportJobParams(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    type: Optional[str] = None
+    created_by: Optional[int] = None
+
+@job_handler("export-products", ExportJobParams)
+async def _export_products_job(ctx, params):
+    """
+    Writes the export to a file served by GET /jobs/{job_id}/result.
+    Progress is reported in rows.
+    """
+    query = _export_query(params["type"], params["created_by"])
+    async with AsyncSessionLocal() as db:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    written = 0
+    async def report_progress(count):
+        nonlocal written
+        written += count
+        await ctx.progress(written, total)
+
+    path = job_file(ctx.job_id, f".{params['format']}")
+    # File I/O runs on the job pool so a large export never blocks the event loop
+    f = await ctx.run_sync(lambda: open(path, "w", newline=""))
+    try:
+        async for piece in _stream_product_export(query, params["format"], on_rows=report_progress):
+            await ctx.run_sync(f.write, piece)
+    finally:
+        await ctx.run_sync(f.close)
+    ctx.result_path = path
+    return {
+        "rows": written,
+        "media_type": EXPORT_MEDIA_TYPES[params["format"]],
+        "filename": f"products.{params['format']}",
+    }
+
+@router.get("/export", dependencies=[Depends(rate_limit("bulk"))], summary="Export the product catalogue as NDJSON or CSV")
+async def export_products(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Output format"),
+    type: Optional[str] = Query(None, description="Only products of this type"),
+    created_by: Optional[int] = Query(None, description="Only products created by this user id"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams every matching product with the ProductResponse fields, ordered by id.
+    """
+    return StreamingResponse(
+        _stream_product_export(_export_query(type, created_by), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
     )
 
-@router.put("/{product_id}/quantity", response_model=ProductResponse, summary="Updating the produuct quanatity")
+@router.post("/lookup", response_model=ProductLookupResponse, summary="Fetch many products by id and/or SKU")
+async def lookup_products(
+    lookup: ProductLookupRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Resolves every key with one query over the id and sku indexes. Products
+    come back in request order (ids first, then skus, duplicates repeated);
+    keys that match nothing are listed in missing_ids / missing_skus.
+    """
+    result = await db.execute(
+        select(*PRODUCT_COLUMNS).where(or_(Product.id.in_(set(lookup.ids)), Product.sku.in_(set(lookup.skus))))
+    )
+    by_id, by_sku = {}, {}
+    for row in result:
+        by_id[row.id] = row
+        by_sku[row.sku] = row
+
+    products, missing_ids, missing_skus = [], [], []
+    for keys, found, missing in ((lookup.ids, by_id, missing_ids), (lookup.skus, by_sku, missing_skus)):
+        for key in keys:
+            if key in found:
+                products.append(found[key])
+            else:
+                missing.append(key)
+
+    return ProductLookupResponse(
+        products=[ProductResponse.model_validate(row) for row in products],
+        missing_ids=missing_ids,
+        missing_skus=missing_skus
+    )
+
+@router.get("/events", summary="Live stream (server-sent events) of product creations and quantity changes")
+async def product_events(
+    request: Request,
+    product_id: Optional[List[int]] = Query(None, description="Only these products (repeatable)"),
+    type: Optional[str] = Query(None, description="Only products of this type"),
+    owner: Optional[int] = Query(None, description="Only products created by this user id"),
+    on_overflow: Literal["drop_oldest", "drop_newest", "disconnect"] = Query(
+        "drop_oldest", description="What to do when this client falls too far behind"
+    ),
+    last_event_id: Optional[int] = Query(None, description="Resume after this event id; the Last-Event-ID header takes precedence"),
+    auth: tuple[User, dict] = Depends(get_current_user_and_token)
+):
+    """
+    Each event's id is its sequence number. EventSource reconnects with the
+    Last-Event-ID header and gets the events it missed replayed, from any worker.
+    """
+    header = request.headers.get("last-event-id")
+    if header:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID header")
+
+    _, payload = auth
+    filters = FeedFilter(frozenset(product_id or ()), type, owner)
+    subscription = await stock_feed.subscribe(filters, on_overflow, last_event_id)
+    return StreamingResponse(
+        stream_events(subscription, payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats", response_model=InventoryStatsResponse, summary="Inventory totals: stock value, counts per type, low stock")
+async def get_inventory_stats(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reads the incrementally maintained per-type summary, so the cost depends on
+    the number of product types, not the size of the catalogue.
+    """
+    result = await db.execute(select(InventorySummary).order_by(InventorySummary.type))
+    by_type = [
+        ProductTypeStats.model_validate(row) for row in result.scalars().all() if row.product_count
+    ]
+    return InventoryStatsResponse(
+        total_products=sum(t.product_count for t in by_type),
+        total_quantity=sum(t.total_quantity for t in by_type),
+        total_value=round(sum(t.total_value for t in by_type), 2),
+        low_stock_count=sum(t.low_stock_count for t in by_type),
+        low_stock_threshold=LOW_STOCK_THRESHOLD,
+        by_type=by_type
+    )
+
+SET_QUANTITY_ATTEMPTS = 3
+
+async def _set_quantity(db: AsyncSession, product_id: int, expected: Optional[int], quantity: int) -> Optional[int]:
+    """
+    Sets an absolute quantity and returns the quantity it replaced. The UPDATE
+    only matches while the row still holds `expected`, so the old value is the
+    one the write actually replaced even when `expected` was read outside the
+    write lock (SQLite's default profile begins the transaction at the first
+    write, not at the SELECT).
+    """
+    for _ in range(SET_QUANTITY_ATTEMPTS):
+        updated = await db.scalar(
+            update(Product)
+            .where(Product.id == product_id, Product.quantity.is_not_distinct_from(expected))
+            .values(quantity=quantity)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        if updated is not None:
+            return expected
+        # The failed UPDATE has started the write transaction; this read is current
+        expected = await db.scalar(select(Product.quantity).where(Product.id == product_id))
+    raise HTTPException(status_code=409, detail=f"Quantity of product {product_id} is changing too often, retry")
+
+@router.put("/{product_id}/quantity", response_model=ProductResponse, dependencies=[Depends(rate_limit("write"))], summary="Updating the produuct quanatity")
 async def update_product_quantity(
     product_id: int,
     quantity_update: ProductQuantityUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_write_db),
     current_user: User = Depends(get_current_user)
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id, with_for_update=True)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this product")
-    product.quantity = quantity_update.quantity
+    old_quantity = await _set_quantity(db, product.id, product.quantity, quantity_update.quantity)
+    set_committed_value(product, "quantity", quantity_update.quantity)
+    movements = StockMovements(current_user.id, "set")
+    movements.record(product.id, old_quantity, quantity_update.quantity)
+    changes = SummaryChanges()
+    changes.quantity_changed(product.type, product.price, old_quantity, quantity_update.quantity)
+    await movements.apply(db)
+    await changes.apply(db)
     
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+    response_cache.invalidate_product(product_id)
+    stock_feed.notify()
     return product
 
 
+@router.post("/quantities", response_model=ProductQuantityBatchResponse, dependencies=[Depends(rate_limit("write"))], summary="Adjust the quantity of many products atomically")
+async def adjust_product_quantities(
+    batch: ProductQuantityBatchUpdate,
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Applies every item (by product_id or sku, as a relative delta or an absolute
+    quantity) in one transaction. Deltas are applied in the UPDATE itself, so
+    concurrent adjustments never overwrite each other. If any item fails, none
+    are applied.
+    """
+    ids = {item.product_id for item in batch.items if item.product_id is not None}
+    skus = {item.sku for item in batch.items if item.sku is not None}
+    # Row locks keep the old quantities exact on PostgreSQL. They are a no-op
+    # on SQLite, where the quantities read here may be stale, so the old
+    # values used for the ledger and summary always come from the UPDATEs.
+    result = await db.execute(
+        select(Product.id, Product.sku, Product.created_by, Product.type, Product.price, Product.quantity)
+        .where(or_(Product.id.in_(ids), Product.sku.in_(skus)))
+        .with_for_update()
+    )
+    by_id, by_sku = {}, {}
+    for row in result:
+        by_id[row.id] = row
+        by_sku[row.sku] = row
+
+    targets = []
+    for item in batch.items:
+        product = by_id.get(item.product_id) if item.product_id is not None else by_sku.get(item.sku)
+        if product is None:
+            key = item.product_id if item.product_id is not None else item.sku
+            raise HTTPException(status_code=404, detail=f"Product '{key}' not found")
+        if product.created_by != current_user.id:
+            raise HTTPException(status_code=403, detail=f"Not authorized to update product {product.id}")
+        targets.append((product, item))
+
+    results = []
+    changes = SummaryChanges()
+    movements = StockMovements(current_user.id, "adjust")
+    current_quantity = {product.id: product.quantity for product, _ in targets}
+    for product, item in targets:
+        if item.delta is not None:
+            new_quantity = (await db.execute(
+                update(Product)
+                .where(Product.id == product.id, Product.quantity + item.delta >= 0)
+                .values(quantity=Product.quantity + item.delta)
+                .returning(Product.quantity)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            if new_quantity is None:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Adjustment would make the quantity of product {product.id} negative"
+                )
+            old_quantity = new_quantity - item.delta
+        else:
+            new_quantity = item.quantity
+            old_quantity = await _set_quantity(db, product.id, current_quantity[product.id], new_quantity)
+        changes.quantity_changed(product.type, product.price, old_quantity, new_quantity)
+        movements.record(product.id, old_quantity, new_quantity)
+        current_quantity[product.id] = new_quantity
+        results.append(ProductQuantityResult(product_id=product.id, sku=product.sku, quantity=new_quantity))
+
+    await movements.apply(db)
+    await changes.apply(db)
+    await db.commit()
+    for product, _ in targets:
+        response_cache.invalidate_product(product.id)
+    stock_feed.notify()
+    return ProductQuantityBatchResponse(results=results)
+
+
+async def _ensure_product_exists(db: AsyncSession, product_id: int):
+    exists = await db.scalar(select(Product.id).where(Product.id == product_id))
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+@router.get("/{product_id}/movements", response_model=StockMovementListResponse, summary="Stock movement history of a product, newest first")
+async def get_product_movements(
+    product_id: int,
+    size: int = Query(50, ge=1, le=500, description="Number of movements per page"),
+    after: Optional[str] = Query(None, description="Opaque cursor from a previous `next_cursor`"),
+    since: Optional[datetime] = Query(None, description="Only movements at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only movements at or before this time"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    await _ensure_product_exists(db, product_id)
+
+    # (ts, id) keyset, served by the (product_id, ts) index
+    query = (
+        select(StockMovement)
+        .where(StockMovement.product_id == product_id)
+        .order_by(StockMovement.ts.desc(), StockMovement.id.desc())
+    )
+    if since is not None:
+        query = query.where(StockMovement.ts >= as_utc(since))
+    if until is not None:
+        query = query.where(StockMovement.ts <= as_utc(until))
+    if after is not None:
+        values = decode_cursor(after, "ts")
+        try:
+            ts, movement_id = datetime.fromisoformat(values[0]), int(values[1])
+        except (ValueError, TypeError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        query = query.where(tuple_(StockMovement.ts, StockMovement.id) < tuple_(as_utc(ts), movement_id))
+
+    result = await db.execute(query.limit(size + 1))
+    rows = result.scalars().all()
+    return StockMovementListResponse(
+        movements=rows[:size],
+        size=size,
+        next_cursor=next_cursor_for(rows, size, "ts", lambda m: [as_utc(m.ts).isoformat(), m.id])
+    )
+
+@router.get("/{product_id}/stock", response_model=StockLevelResponse, summary="Quantity of a product at a point in time")
+async def get_product_stock_at(
+    product_id: int,
+    at: Optional[datetime] = Query(None, description="Point in time; defaults to now"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reads the latest snapshot at or before `at` and adds the movements since,
+    so the cost is bounded by the snapshot interval rather than the history.
+    """
+    await _ensure_product_exists(db, product_id)
+    at = as_utc(at) if at is not None else datetime.now(timezone.utc)
+    return StockLevelResponse(product_id=product_id, at=at, quantity=await quantity_at(db, product_id, at))
+
+
 @router.get("/{product_id}", response_model=ProductResponse, summary="Get a particular product details")
 async def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    cache_key = response_cache.product_key(product_id)
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        stamp = response_cache.current_stamp()
+        product = await db.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = ProductResponse.model_validate(product).model_dump_json().encode()
+        entry = response_cache.store(cache_key, body, stamp)
+    return cached_json_response(request, entry)
 
 
@@ -1,33 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
 
-from database import get_db
+from database import get_async_db
 from core.auth import get_current_user
+from core.pagination import decode_cursor, next_cursor_for
+from core.search import prefix_conditions
+from models.product import Product
 from models.user import User
-from schemas.user import UserResponse
+from schemas.user import UserListItem, UserListResponse, UserResponse
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# Keyset sort options, both served by an index (username is unique)
+USER_SORT_KEYS = {
+    "id": (User.id,),
+    "username": (User.username, User.id),
+}
+
 
 # Getting all users
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=UserListResponse)
 async def get_all_users(
-    db: Session = Depends(get_db),
+    size: int = Query(50, ge=1, le=500, description="Number of users per page"),
+    after: Optional[str] = Query(None, description="Opaque cursor from a previous `next_cursor`"),
+    sort: Literal["id", "username"] = Query("id", description="Sort key for the listing"),
+    username: Optional[str] = Query(None, min_length=1, max_length=50, description="Username prefix"),
+    include_product_count: bool = Query(False, description="Add the number of products each user created"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    users = db.query(User).all()
-    return users
+    """
+    Selects only the listed columns, so rows come back as plain tuples rather
+    than ORM objects (and the password hash never leaves the database).
+    """
+    sort_columns = USER_SORT_KEYS[sort]
+    query = select(User.id, User.username).order_by(*sort_columns)
+    if username is not None:
+        query = query.where(*prefix_conditions(db.bind.dialect.name, User.username, username))
+    if after is not None:
+        values = decode_cursor(after, sort, sort_columns)
+        query = query.where(tuple_(*sort_columns) > tuple_(*values))
+
+    result = await db.execute(query.limit(size + 1))
+    rows = result.all()
+    next_cursor = next_cursor_for(rows, size, sort, lambda u: [getattr(u, c.key) for c in sort_columns])
+    rows = rows[:size]
+
+    product_counts = None
+    if include_product_count and rows:
+        # One grouped query for the whole page instead of loading User.products
+        counts = await db.execute(
+            select(Product.created_by, func.count(Product.id))
+            .where(Product.created_by.in_([row.id for row in rows]))
+            .group_by(Product.created_by)
+        )
+        product_counts = dict(counts.all())
+
+    return UserListResponse(
+        users=[
+            UserListItem(
+                id=row.id,
+                username=row.username,
+                product_count=product_counts.get(row.id, 0) if product_counts is not None else None
+            )
+            for row in rows
+        ],
+        size=size,
+        next_cursor=next_cursor
+    )
 
 
 # Getting user by ID
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Any, Optional
+from datetime import datetime
+
+class JobSubmit(BaseModel):
+    kind: str
+    params: dict[str, Any] = {}
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress_done: int
+    progress_total: Optional[int] = None
+    cancel_requested: bool
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class JobListResponse(BaseModel):
+    jobs: list[JobResponse]
+    size: int
+    next_cursor: Optional[str] = None
+
+class NoJobParams(BaseModel):
+    pass
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 from typing import Optional
 from datetime import datetime
 
@@ -21,6 +21,31 @@ class ProductCreateResponse(BaseModel):
 class ProductQuantityUpdate(BaseModel):
     quantity: int = Field(ge=0)
 
+class ProductQuantityAdjustment(BaseModel):
+    product_id: Optional[int] = None
+    sku: Optional[str] = Field(None, min_length=1, max_length=50)
+    delta: Optional[int] = None
+    quantity: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_target_and_change(self):
+        if (self.product_id is None) == (self.sku is None):
+            raise ValueError("Provide exactly one of 'product_id' or 'sku'")
+        if (self.delta is None) == (self.quantity is None):
+            raise ValueError("Provide exactly one of 'delta' or 'quantity'")
+        return self
+
+class ProductQuantityBatchUpdate(BaseModel):
+    items: list[ProductQuantityAdjustment] = Field(min_length=1, max_length=5000)
+
+class ProductQuantityResult(BaseModel):
+    product_id: int
+    sku: str
+    quantity: int
+
+class ProductQuantityBatchResponse(BaseModel):
+    results: list[ProductQuantityResult]
+
 class ProductResponse(ProductBase):
     id: int
     created_by: int
@@ -30,7 +55,80 @@ class ProductResponse(ProductBase):
 
 class ProductListResponse(BaseModel):
     products: list[ProductResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+PRODUCT_LOOKUP_MAX_KEYS = 500
+
+class ProductLookupRequest(BaseModel):
+    ids: list[int] = Field(default_factory=list)
+    skus: list[str] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def check_keys(self):
+        count = len(self.ids) + len(self.skus)
+        if count == 0:
+            raise ValueError("Provide at least one of 'ids' or 'skus'")
+        if count > PRODUCT_LOOKUP_MAX_KEYS:
+            raise ValueError(f"At most {PRODUCT_LOOKUP_MAX_KEYS} ids and skus in total")
+        return self
+
+class ProductLookupResponse(BaseModel):
+    products: list[ProductResponse]
+    missing_ids: list[int]
+    missing_skus: list[str]
+
+class ProductImportError(BaseModel):
+    row: int
+    sku: Optional[str] = None
+    error: str
+
+class ProductImportResponse(BaseModel):
+    processed: int
+    created: int
+    failed: int
+    errors: list[ProductImportError]
+    errors_truncated: bool = False
+
+class ProductTypeStats(BaseModel):
+    type: str
+    product_count: int
+    total_quantity: int
+    total_value: float
+    low_stock_count: int
+
+    class Config:
+        from_attributes = True
+
+class InventoryStatsResponse(BaseModel):
+    total_products: int
+    total_quantity: int
+    total_value: float
+    low_stock_count: int
+    low_stock_threshold: int
+    by_type: list[ProductTypeStats]
+
+class StockMovementResponse(BaseModel):
+    id: int
+    product_id: int
+    delta: int
+    quantity_after: Optional[int] = None
+    user_id: Optional[int] = None
+    reason: str
+    ts: datetime
+
+    class Config:
+        from_attributes = True
+
+class StockMovementListResponse(BaseModel):
+    movements: list[StockMovementResponse]
+    size: int
+    next_cursor: Optional[str] = None
+
+class StockLevelResponse(BaseModel):
+    product_id: int
+    at: datetime
+    quantity: int
@@ -20,3 +20,15 @@ class UserResponse(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+class UserListItem(UserResponse):
+    product_count: Optional[int] = None
+
+class UserListResponse(BaseModel):
+    users: list[UserListItem]
+    size: int
+    next_cursor: Optional[str] = None
+
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str = Field(min_length=3, max_length=255)
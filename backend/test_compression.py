@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.compression import gzip_accepted
+
+
+def test_plain_gzip_is_accepted():
+    assert gzip_accepted("gzip")
+    assert gzip_accepted("deflate, gzip;q=0.5, br")
+    assert gzip_accepted("GZIP ; q=1")
+
+
+def test_missing_or_refused_gzip_is_not_accepted():
+    assert not gzip_accepted("")
+    assert not gzip_accepted("br, deflate")
+    assert not gzip_accepted("gzip;q=0")
+    assert not gzip_accepted("gzip; q=0.000")
+
+
+def test_wildcard_applies_only_when_gzip_is_not_listed():
+    assert gzip_accepted("*")
+    assert gzip_accepted("br, *;q=0.1")
+    assert not gzip_accepted("*;q=0")
+    assert not gzip_accepted("gzip;q=0, *")
+    assert not gzip_accepted("*, gzip;q=0")
+    assert gzip_accepted("gzip;q=0.5, *;q=0")
+    assert gzip_accepted("*;q=0, gzip")
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PRODUCTS = 5
+REQUESTS = 300
+
+
+async def _concurrent_writes() -> None:
+    """
+    Runs inside a subprocess configured by the test: PUT quantity and batch
+    adjustments racing on a handful of products through the in-process app.
+    """
+    import httpx
+
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test/api", timeout=60) as client:
+        credentials = {"username": "stock-consistency", "password": "stock-consistency"}
+        await client.post("/register", json=credentials)
+        token = (await client.post("/login", json=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        product_ids = []
+        for i in range(PRODUCTS):
+            res = await client.post("/products/", headers=headers, json={
+                "name": f"Product {i}", "type": f"t{i % 3}", "sku": f"CONSISTENCY-{i}", "quantity": 20, "price": 1.5,
+            })
+            res.raise_for_status()
+            product_ids.append(res.json()["product_id"])
+
+        def request(i: int):
+            product_id = random.choice(product_ids)
+            if i % 3 == 0:
+                return client.put(f"/products/{product_id}/quantity", headers=headers, json={"quantity": random.randint(0, 30)})
+            item = {"product_id": product_id}
+            if i % 3 == 1:
+                item["delta"] = random.randint(-5, 5)
+            else:
+                item["quantity"] = random.randint(0, 30)
+            return client.post("/products/quantities", headers=headers, json={"items": [item]})
+
+        # Failed requests (locked database, negative quantity) roll back and are fine
+        await asyncio.gather(*(request(i) for i in range(REQUESTS)), return_exceptions=True)
+
+
+def test_ledger_and_summary_match_products_after_concurrent_writes():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "consistency.db")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{path}",
+            "STARTUP_LOCK_FILE": os.path.join(workdir, "startup.lock"),
+            "SECRET_KEY": "consistency-test-secret",
+            # Deferred transactions: the profile where reads can be stale
+            "SQLITE_PROFILE": "default",
+            "RATE_LIMIT_ENABLED": "false",
+            "LOAD_SHED_MAX_IN_FLIGHT": str(REQUESTS * 2),
+            "RESPONSE_CACHE_ENABLED": "false",
+        }
+        for args in (["-m", "migrations", "upgrade"], [__file__]):
+            result = subprocess.run(
+                [sys.executable, *args], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300
+            )
+            assert result.returncode == 0, result.stderr
+
+        with sqlite3.connect(path) as connection:
+            drifted = connection.execute(
+                """SELECT p.id, p.quantity, COALESCE(SUM(m.delta), 0) FROM products p
+                   LEFT JOIN stock_movements m ON m.product_id = p.id
+                   GROUP BY p.id HAVING p.quantity != COALESCE(SUM(m.delta), 0)"""
+            ).fetchall()
+            assert drifted == [], f"(product, quantity, ledger sum): {drifted}"
+
+            summary = dict(connection.execute("SELECT type, total_quantity FROM inventory_summary").fetchall())
+            actual = dict(connection.execute("SELECT type, SUM(quantity) FROM products GROUP BY type").fetchall())
+            assert summary == actual
+
+
+if __name__ == "__main__":
+    asyncio.run(_concurrent_writes())